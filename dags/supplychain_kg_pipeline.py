@@ -2,8 +2,7 @@ import os
 from datetime import datetime
 
 from airflow import DAG
-from airflow.operators.bash import BashOperator
-from airflow.operators.python import PythonOperator
+from airflow.operators.python import PythonOperator, ShortCircuitOperator
 
 # Astro paths:
 # - dags:     /usr/local/airflow/dags
@@ -15,16 +14,42 @@ DBT_DIR = f"{INCLUDE}/dbt_supplychain"
 DBT_PROFILES_DIR = f"{DBT_DIR}/profiles"
 
 BQ_LOADER = f"{INCLUDE}/scripts/bq_load_raw.py"
-KG_EXPORTER = f"{INCLUDE}/kg/export/export_supplychain_kg.py"
+KG_EXPORT_DIR = f"{INCLUDE}/kg/export"
+KG_EXPORTER = f"{KG_EXPORT_DIR}/export_supplychain_kg.py"
 KG_LOADER = f"{INCLUDE}/kg/load/load_fuseki.py"
 
 TTL_OUT = os.environ.get("TTL_OUT", f"{INCLUDE}/data/kg/supplychain.ttl")
+# Written by the exporter next to the TTL, read by the GraphRAG API
+KG_ARTIFACTS = ["supplier_alternatives.json", "supply_concentration.json", "shipments.npz"]
+KG_ARTIFACT_PATHS = [os.path.join(os.path.dirname(TTL_OUT), a) for a in KG_ARTIFACTS]
 DBT_BIN = os.environ.get("DBT_BIN", "/usr/local/airflow/dbt_venv/bin/dbt")
 
 # Fuseki (inside docker network)
 FUSEKI_URL = os.environ.get("FUSEKI_URL", "http://fuseki:3030")
 FUSEKI_DATASET = os.environ.get("FUSEKI_DATASET", "sc")
 
+# Change detection state (raw CSV hashes, dbt project hash, mart fingerprints)
+# and per-task stats. Delete the directory to force a full rebuild.
+STATE_DIR = os.environ.get("KG_STATE_DIR", f"{INCLUDE}/data/kg/state")
+# "content": COUNT + order-independent row hash per mart (scans the marts).
+# "metadata": row_count/size/last_modified from __TABLES__ (free, but any dbt
+#             rebuild of a table counts as a change).
+MART_FINGERPRINT_MODE = os.environ.get("MART_FINGERPRINT_MODE", "content")
+
+MART_TABLES = [
+    "dim_supplier",
+    "dim_part",
+    "dim_product",
+    "dim_facility",
+    "dim_region",
+    "f_bom_component",
+    "f_part_dependency",
+    "f_shipment",
+    "f_disruption",
+    "f_supplier_part",
+    "f_supplier_facility",
+]
+
 
 def _run_and_log(cmd: list[str]) -> None:
     """Run a subprocess and always print stdout/stderr into Airflow logs."""
@@ -38,27 +63,319 @@ def _run_and_log(cmd: list[str]) -> None:
     p.check_returncode()
 
 
-def _bq_load_raw():
-    _run_and_log(["python", "-u", BQ_LOADER, "--raw-dir", RAW_DIR])
+def _read_state(name: str) -> dict:
+    import json
+
+    path = os.path.join(STATE_DIR, f"{name}.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_state(name: str, data: dict) -> None:
+    import json
+
+    os.makedirs(STATE_DIR, exist_ok=True)
+    path = os.path.join(STATE_DIR, f"{name}.json")
+    tmp = f"{path}.tmp"
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _record_stats(context, started: float, bytes_processed: int, **extra) -> None:
+    """Push duration/bytes to XCom and append them to task_stats.jsonl."""
+    import json
+    import time
+
+    stats = {
+        "run_id": context["run_id"],
+        "task_id": context["ti"].task_id,
+        "seconds": round(time.monotonic() - started, 3),
+        "bytes_processed": int(bytes_processed),
+        **extra,
+    }
+    print(f"task stats: {stats}")
+    context["ti"].xcom_push(key="stats", value=stats)
+    os.makedirs(STATE_DIR, exist_ok=True)
+    with open(os.path.join(STATE_DIR, "task_stats.jsonl"), "a") as f:
+        f.write(json.dumps(stats) + "\n")
+
+
+def _sha256_file(path: str) -> str:
+    import hashlib
+
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _dbt_project_hash() -> str:
+    import hashlib
+
+    h = hashlib.sha256()
+    for root, dirs, files in os.walk(DBT_DIR):
+        dirs[:] = sorted(d for d in dirs if d not in ("target", "logs", "dbt_packages"))
+        for name in sorted(files):
+            if name.endswith((".sql", ".yml", ".yaml")):
+                path = os.path.join(root, name)
+                h.update(os.path.relpath(path, DBT_DIR).encode())
+                h.update(_sha256_file(path).encode())
+    return h.hexdigest()
+
+
+def _exporter_hash() -> str:
+    # Exporter code is part of the mart fingerprint: a change to the TTL or
+    # side-artifact logic re-exports even when no mart row changed.
+    import glob
+    import hashlib
+
+    h = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(KG_EXPORT_DIR, "*.py"))):
+        h.update(os.path.basename(path).encode())
+        h.update(_sha256_file(path).encode())
+    return h.hexdigest()
+
+
+def _new_build_id() -> str:
+    # The exporter's own format (sortable UTC timestamp)
+    import sys
+
+    if KG_EXPORT_DIR not in sys.path:
+        sys.path.insert(0, KG_EXPORT_DIR)
+    from export_supplychain_kg import new_build_id
+
+    return new_build_id()
+
+
+def _bq_load_raw(**context):
+    import glob
+    import time
+
+    started = time.monotonic()
+    hashes = {
+        os.path.splitext(os.path.basename(p))[0]: _sha256_file(p)
+        for p in sorted(glob.glob(os.path.join(RAW_DIR, "*.csv")))
+    }
+    previous = _read_state("raw_sources").get("hashes", {})
+    changed = sorted(t for t, h in hashes.items() if previous.get(t) != h)
+
+    if changed:
+        _run_and_log(["python", "-u", BQ_LOADER, "--raw-dir", RAW_DIR, "--tables", *changed])
+    else:
+        print("Raw CSVs unchanged since the last load; nothing to upload.")
+
+    # Committed to raw_sources.json only after dbt succeeds (see _dbt_run_and_test),
+    # so a failed dbt run is retried against the same changes.
+    context["ti"].xcom_push(key="changed_sources", value=changed)
+    context["ti"].xcom_push(key="source_hashes", value=hashes)
+    uploaded = sum(os.path.getsize(os.path.join(RAW_DIR, f"{t}.csv")) for t in changed)
+    _record_stats(context, started, uploaded, changed_sources=changed)
+
+
+def _dbt_bytes_processed() -> int:
+    """BigQuery bytes billed to the last dbt invocation, from target/run_results.json."""
+    import json
+
+    path = os.path.join(DBT_DIR, "target", "run_results.json")
+    if not os.path.exists(path):
+        return 0
+    with open(path) as f:
+        results = json.load(f).get("results", [])
+    return sum(int((r.get("adapter_response") or {}).get("bytes_processed") or 0) for r in results)
+
+
+def _dbt_run_and_test(**context):
+    import time
+
+    started = time.monotonic()
+    ti = context["ti"]
+    changed = ti.xcom_pull(task_ids="load_raw_to_bigquery", key="changed_sources") or []
+    hashes = ti.xcom_pull(task_ids="load_raw_to_bigquery", key="source_hashes") or {}
+
+    state = _read_state("raw_sources")
+    project_hash = _dbt_project_hash()
+    full = not state or state.get("dbt_project") != project_hash
 
+    dirs = ["--project-dir", DBT_DIR, "--profiles-dir", DBT_PROFILES_DIR]
 
-def _export_rdf():
-    _run_and_log(["python", "-u", KG_EXPORTER, "--out", TTL_OUT])
+    if full:
+        # First run, or models/config changed: rebuild everything.
+        print("dbt project changed (or no state): full dbt run")
+        selector = []
+    elif changed:
+        # Only models downstream of the sources whose raw tables were reloaded.
+        selector = ["--select", *[f"source:raw.{t}+" for t in changed]]
+        print(f"dbt: building downstream of changed sources {changed}")
+    else:
+        print("No raw or dbt project changes: skipping dbt run/test")
+        _record_stats(context, started, 0, dbt_selector="skipped")
+        return
 
+    _run_and_log([DBT_BIN, "--version"])
+    _run_and_log([DBT_BIN, "debug", *dirs])
+    # Each invocation rewrites run_results.json, so read it after each one
+    _run_and_log([DBT_BIN, "run", *dirs, *selector])
+    run_bytes = _dbt_bytes_processed()
+    _run_and_log([DBT_BIN, "test", *dirs, *selector])
+    test_bytes = _dbt_bytes_processed()
 
-def _load_fuseki():
-    import subprocess, os
+    _write_state("raw_sources", {"hashes": hashes, "dbt_project": project_hash})
+    _record_stats(
+        context,
+        started,
+        run_bytes + test_bytes,
+        dbt_selector=" ".join(selector) or "all",
+        dbt_run_bytes=run_bytes,
+        dbt_test_bytes=test_bytes,
+    )
+
+
+def _mart_fingerprint():
+    """Return ({table: fingerprint parts}, bytes processed) for MART_TABLES."""
+    from google.cloud import bigquery
+
+    project = os.environ["BQ_WH_PROJECT"]
+    dataset = os.environ["BQ_WH_DATASET"]
+    client = bigquery.Client(project=project)
+
+    if MART_FINGERPRINT_MODE == "metadata":
+        tables = ", ".join(f"'{t}'" for t in MART_TABLES)
+        q = f"""
+SELECT table_id AS t, row_count AS n, size_bytes AS b, last_modified_time AS h
+FROM `{project}.{dataset}.__TABLES__`
+WHERE table_id IN ({tables})
+"""
+    else:
+        # BIT_XOR of per-row fingerprints: order independent, unchanged by a
+        # rebuild that produces the same rows. Identical rows are numbered
+        # first so that a duplicated row does not cancel itself out.
+        q = "\nUNION ALL\n".join(
+            f"SELECT '{t}' AS t, COUNT(*) AS n, 0 AS b, "
+            f"IFNULL(BIT_XOR(FARM_FINGERPRINT(FORMAT('%d:%d', h, rn))), 0) AS h "
+            f"FROM (SELECT h, ROW_NUMBER() OVER (PARTITION BY h) AS rn "
+            f"FROM (SELECT FARM_FINGERPRINT(TO_JSON_STRING(x)) AS h FROM `{project}.{dataset}.{t}` x))"
+            for t in MART_TABLES
+        )
+
+    job = client.query(q)
+    rows = job.result()
+    fp = {r["t"]: [int(r["n"]), int(r["b"]), int(r["h"])] for r in rows}
+    return fp, int(job.total_bytes_processed or 0)
+
+
+def _fingerprint_marts(**context):
+    import hashlib
+    import json
+    import time
+
+    started = time.monotonic()
+    tables, scanned = _mart_fingerprint()
+    missing = sorted(set(MART_TABLES) - set(tables))
+    if missing:
+        raise RuntimeError(f"Mart tables missing from the warehouse: {missing}")
+
+    exporter = _exporter_hash()
+    digest = hashlib.sha256(json.dumps({"marts": tables, "exporter": exporter}, sort_keys=True).encode()).hexdigest()
+    print(f"Mart fingerprint ({MART_FINGERPRINT_MODE}, exporter {exporter[:12]}): {digest}")
+    context["ti"].xcom_push(key="fingerprint", value=digest)
+    _record_stats(context, started, scanned, fingerprint=digest)
+    return digest
+
+
+def _fuseki_target() -> tuple[str, str]:
+    return (
+        os.environ.get("FUSEKI_URL", "http://host.docker.internal:3030"),
+        os.environ.get("FUSEKI_DATASET", "sc"),
+    )
+
+
+def _fuseki_has_build(build_id: str) -> bool:
+    """Whether Fuseki still holds the KG build stamped `build_id` (scr:buildId)."""
+    import requests
+
+    fuseki_url, dataset = _fuseki_target()
+    q = f"""
+PREFIX scr: <https://example.org/supplychain/kg#>
+ASK {{ ?b a scr:KGBuild ; scr:buildId "{build_id}" }}
+"""
+    r = requests.post(
+        f"{fuseki_url.rstrip('/')}/{dataset}/sparql",
+        data={"query": q},
+        headers={"Accept": "application/sparql-results+json"},
+        timeout=30,
+    )
+    r.raise_for_status()
+    return bool(r.json().get("boolean"))
+
+
+def _marts_changed(**context) -> bool:
+    fp = context["ti"].xcom_pull(task_ids="fingerprint_marts", key="fingerprint")
+    loaded = _read_state("kg_loaded")
+    if fp != loaded.get("fingerprint"):
+        return True
+    missing = [p for p in KG_ARTIFACT_PATHS if not os.path.exists(p)]
+    if missing:
+        print(f"KG artifacts missing: {missing}; re-exporting.")
+        return True
+    # The local state can outlive Fuseki's data (e.g. `make down` drops the volume)
+    build_id = loaded.get("build_id")
+    if not build_id or not _fuseki_has_build(build_id):
+        print(f"Fuseki does not hold the last loaded build ({build_id}); reloading.")
+        return True
+    print(f"Marts unchanged since the last Fuseki load ({fp}, build {build_id}); skipping export and load.")
+    return False
+
+
+def _export_rdf(**context):
+    import time
+
+    started = time.monotonic()
+    fp = context["ti"].xcom_pull(task_ids="fingerprint_marts", key="fingerprint")
+    exported = _read_state("kg_exported")
+
+    if exported.get("fingerprint") == fp and all(os.path.exists(p) for p in [TTL_OUT, *KG_ARTIFACT_PATHS]):
+        # Marts match the cached TTL, only the Fuseki load is missing.
+        if exported.get("build_id"):
+            print(f"Reusing cached TTL {TTL_OUT} (fingerprint {fp}, build {exported['build_id']})")
+            context["ti"].xcom_push(key="build_id", value=exported["build_id"])
+            _record_stats(context, started, 0, reused=True)
+            return
+
+    build_id = _new_build_id()
+    _run_and_log(["python", "-u", KG_EXPORTER, "--out", TTL_OUT, "--build-id", build_id])
+    _write_state(
+        "kg_exported",
+        {"fingerprint": fp, "build_id": build_id, "ttl": TTL_OUT, "run_id": context["run_id"]},
+    )
+    context["ti"].xcom_push(key="build_id", value=build_id)
+    _record_stats(context, started, os.path.getsize(TTL_OUT), reused=False)
+
+
+def _load_fuseki(**context):
+    import time
+
+    started = time.monotonic()
     ttl_out = os.environ.get("TTL_OUT", "/usr/local/airflow/include/data/kg/supplychain.ttl")
-    fuseki_url = os.environ.get("FUSEKI_URL", "http://host.docker.internal:3030")
-    dataset = os.environ.get("FUSEKI_DATASET", "sc")
+    fuseki_url, dataset = _fuseki_target()
 
-    subprocess.check_call([
-        "python", "-u", "/usr/local/airflow/include/kg/load/load_fuseki.py",
+    _run_and_log([
+        "python", "-u", KG_LOADER,
         "--fuseki-url", fuseki_url,
         "--dataset", dataset,
-        "--ttl", ttl_out
+        "--ttl", ttl_out,
     ])
 
+    fp = context["ti"].xcom_pull(task_ids="fingerprint_marts", key="fingerprint")
+    build_id = context["ti"].xcom_pull(task_ids="export_rdf_ttl", key="build_id")
+    _write_state(
+        "kg_loaded",
+        {"fingerprint": fp, "build_id": build_id, "dataset": dataset, "run_id": context["run_id"]},
+    )
+    _record_stats(context, started, os.path.getsize(ttl_out))
 
 
 with DAG(
@@ -75,16 +392,19 @@ with DAG(
         python_callable=_bq_load_raw,
     )
 
-    dbt_run = BashOperator(
+    dbt_run = PythonOperator(
         task_id="dbt_run_and_test",
-        bash_command=(
-            f"cd {DBT_DIR} && "
-            f"export DBT_PROFILES_DIR={DBT_PROFILES_DIR} && "
-            f"{DBT_BIN} --version && "
-            f"{DBT_BIN} debug && "
-            f"{DBT_BIN} run && "
-            f"{DBT_BIN} test"
-        ),
+        python_callable=_dbt_run_and_test,
+    )
+
+    fingerprint = PythonOperator(
+        task_id="fingerprint_marts",
+        python_callable=_fingerprint_marts,
+    )
+
+    marts_changed = ShortCircuitOperator(
+        task_id="marts_changed",
+        python_callable=_marts_changed,
     )
 
     export_rdf = PythonOperator(
@@ -97,4 +417,4 @@ with DAG(
         python_callable=_load_fuseki,
     )
 
-    load_raw >> dbt_run >> export_rdf >> load_graph
+    load_raw >> dbt_run >> fingerprint >> marts_changed >> export_rdf >> load_graph
@@ -0,0 +1,4 @@
+select
+  sf.supplier_id as supplier_key,
+  sf.facility_id as facility_key
+from {{ ref('stg_supplier_facilities') }} sf
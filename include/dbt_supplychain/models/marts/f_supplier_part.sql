@@ -0,0 +1,4 @@
+select
+  sp.supplier_id as supplier_key,
+  sp.part_id as part_key
+from {{ ref('stg_supplier_parts') }} sp
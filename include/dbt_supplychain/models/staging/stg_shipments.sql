@@ -8,3 +8,19 @@ select
   cast(lead_time_days as int64) as lead_time_days,
   status
 from {{ source('raw', 'shipments') }}
+
+union all
+
+-- Shipments posted to the API; a shipment_id present in the CSV wins
+select
+  shipment_id,
+  date(ship_date) as ship_date,
+  supplier_id,
+  part_id,
+  facility_id,
+  cast(qty as int64) as qty,
+  cast(round(lead_time_days) as int64) as lead_time_days,
+  status
+from {{ source('raw', 'shipments_posted') }}
+where shipment_id not in (select shipment_id from {{ source('raw', 'shipments') }})
+qualify row_number() over (partition by shipment_id order by ship_date) = 1
@@ -0,0 +1,139 @@
+import os
+import argparse
+import tempfile
+import time
+from typing import Dict
+
+import numpy as np
+import pandas as pd
+
+from export_supplychain_kg import build_graph
+from export_neo4j_csv import write_csvs
+
+
+def synthetic_marts(suppliers: int, parts: int, products: int, shipments: int, seed: int = 0) -> Dict[str, pd.DataFrame]:
+    """Random marts with the same columns/dtypes as the BigQuery tables."""
+    rng = np.random.default_rng(seed)
+
+    def dates(offsets: np.ndarray) -> np.ndarray:
+        # BigQuery DATE columns arrive as datetime.date objects
+        return (pd.Timestamp("2024-01-01") + pd.to_timedelta(offsets, unit="D")).date
+
+    facilities = max(suppliers // 20, 1)
+    regions = max(facilities // 4, 1)
+
+    def keys(prefix: str, n: int) -> np.ndarray:
+        return np.char.add(prefix, np.arange(n).astype(str))
+
+    sup_k, part_k, prod_k = keys("S", suppliers), keys("C", parts), keys("P", products)
+    fac_k, reg_k = keys("F", facilities), keys("R", regions)
+
+    dep_child = np.arange(1, parts)
+    dep_child = dep_child[rng.random(len(dep_child)) < 0.7]
+    bom_n = products * 10
+    sp_n = parts * 2
+    disr_n = max(suppliers // 10, 1)
+    start_offsets = rng.integers(0, 700, disr_n)
+
+    return {
+        "dim_supplier": pd.DataFrame({
+            "supplier_key": sup_k,
+            "supplier_name": np.char.add("Supplier ", sup_k),
+            "tier": rng.integers(1, 4, suppliers),
+            "country_code": rng.choice(["ES", "DE", "FR", "PL", "CN", "US"], suppliers),
+        }),
+        "dim_part": pd.DataFrame({
+            "part_key": part_k,
+            "part_name": np.char.add("Part ", part_k),
+            "criticality": rng.choice(["HIGH", "MEDIUM", "LOW"], parts),
+        }),
+        "dim_product": pd.DataFrame({
+            "product_key": prod_k,
+            "product_name": np.char.add("Product ", prod_k),
+            "category": rng.choice(["Small Appliance", "Home Appliance"], products),
+        }),
+        "dim_facility": pd.DataFrame({
+            "facility_key": fac_k,
+            "facility_name": np.char.add("Facility ", fac_k),
+            "facility_type": rng.choice(["PLANT", "DC"], facilities),
+            "region_key": reg_k[rng.integers(0, regions, facilities)],
+        }),
+        "dim_region": pd.DataFrame({
+            "region_key": reg_k,
+            "region_name": np.char.add("Region ", reg_k),
+            "country_code": rng.choice(["ES", "DE", "FR"], regions),
+        }),
+        "f_bom_component": pd.DataFrame({
+            "product_key": prod_k[np.repeat(np.arange(products), 10)],
+            "part_key": part_k[rng.integers(0, parts, bom_n)],
+            "qty": rng.integers(1, 5, bom_n),
+        }),
+        "f_part_dependency": pd.DataFrame({
+            "parent_part_key": part_k[(rng.random(len(dep_child)) * dep_child).astype(int)],
+            "child_part_key": part_k[dep_child],
+            "qty": rng.integers(1, 5, len(dep_child)),
+        }),
+        "f_shipment": pd.DataFrame({
+            "shipment_id": keys("SH", shipments),
+            "ship_date": dates(rng.integers(0, 700, shipments)),
+            "supplier_key": sup_k[rng.integers(0, suppliers, shipments)],
+            "part_key": part_k[rng.integers(0, parts, shipments)],
+            "facility_key": fac_k[rng.integers(0, facilities, shipments)],
+            "qty": rng.integers(10, 5000, shipments),
+            "lead_time_days": rng.integers(2, 30, shipments),
+            "status": rng.choice(["ON_TIME", "LATE"], shipments, p=[0.85, 0.15]),
+        }),
+        "f_disruption": pd.DataFrame({
+            "disruption_id": keys("D", disr_n),
+            "supplier_key": sup_k[rng.integers(0, suppliers, disr_n)],
+            "start_date": dates(start_offsets),
+            "end_date": dates(start_offsets + rng.integers(1, 30, disr_n)),
+            "disruption_type": rng.choice(["FIRE", "PORT_CONGESTION", "STRIKE"], disr_n),
+            "severity": rng.random(disr_n).round(2),
+        }),
+        "f_supplier_part": pd.DataFrame({
+            "supplier_key": sup_k[rng.integers(0, suppliers, sp_n)],
+            "part_key": part_k[np.repeat(np.arange(parts), 2)],
+        }).drop_duplicates(),
+        "f_supplier_facility": pd.DataFrame({
+            "supplier_key": sup_k,
+            "facility_key": fac_k[rng.integers(0, facilities, suppliers)],
+        }),
+    }
+
+
+def _dir_bytes(path: str) -> int:
+    return sum(os.path.getsize(os.path.join(path, f)) for f in os.listdir(path))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Neo4j bulk CSV vs rdflib/Turtle export on synthetic marts")
+    ap.add_argument("--suppliers", type=int, default=2_000)
+    ap.add_argument("--parts", type=int, default=20_000)
+    ap.add_argument("--products", type=int, default=1_000)
+    ap.add_argument("--shipments", type=int, default=100_000)
+    ap.add_argument("--skip-ttl", action="store_true", help="Only time the CSV path (TTL is slow at scale)")
+    args = ap.parse_args()
+
+    marts = synthetic_marts(args.suppliers, args.parts, args.products, args.shipments)
+    print("rows:", {k: len(v) for k, v in marts.items()})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_dir = os.path.join(tmp, "neo4j")
+        t0 = time.perf_counter()
+        write_csvs(marts, csv_dir)
+        csv_s = time.perf_counter() - t0
+        print(f"neo4j csv : {csv_s:8.2f}s  {_dir_bytes(csv_dir) / 1e6:8.1f} MB")
+
+        if not args.skip_ttl:
+            ttl = os.path.join(tmp, "supplychain.ttl")
+            t0 = time.perf_counter()
+            g = build_graph(marts)
+            g.serialize(destination=ttl, format="turtle")
+            ttl_s = time.perf_counter() - t0
+            print(f"rdf turtle: {ttl_s:8.2f}s  {os.path.getsize(ttl) / 1e6:8.1f} MB  (triples={len(g)})")
+            print(f"speedup   : {ttl_s / csv_s:8.1f}x (export only; n10s import of the TTL is extra)")
+
+
+if __name__ == "__main__":
+    main()
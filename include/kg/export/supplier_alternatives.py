@@ -0,0 +1,95 @@
+import json
+import os
+from typing import Any, Dict
+
+import numpy as np
+import pandas as pd
+
+
+ARTIFACT_NAME = "supplier_alternatives.json"
+
+# Weight, in shipments, of a supplier's overall on-time rate in its per-part score
+PRIOR_SHIPMENTS = 5.0
+
+
+def build_alternatives(marts: Dict[str, pd.DataFrame], build_id: str) -> Dict[str, Any]:
+    """Inverted index part -> suppliers, best substitute first.
+
+    Candidates are every approved source (f_supplier_part) plus anyone who
+    actually shipped the part. The score is the supplier's on-time rate for
+    the part shrunk towards its overall rate,
+    (on_time + a * overall) / (shipments + a) with a = PRIOR_SHIPMENTS, so a
+    few part shipments move it only part of the way and a supplier without
+    part history scores its overall rate (itself smoothed as
+    (on_time + 1) / (shipments + 2)). Ties break on shipment count, then
+    lower tier.
+    """
+    ship = marts["f_shipment"][["supplier_key", "part_key", "status"]].copy()
+    ship["on_time"] = (ship["status"].astype("string").str.upper() == "ON_TIME").astype("int64")
+
+    by_sup = ship.groupby("supplier_key").agg(sup_shipments=("on_time", "size"), sup_on_time=("on_time", "sum"))
+    by_pair = ship.groupby(["supplier_key", "part_key"]).agg(shipments=("on_time", "size"), on_time=("on_time", "sum"))
+
+    pairs = pd.concat([
+        marts["f_supplier_part"][["supplier_key", "part_key"]],
+        ship[["supplier_key", "part_key"]],
+    ]).drop_duplicates()
+    pairs = (
+        pairs.merge(by_pair, on=["supplier_key", "part_key"], how="left")
+        .merge(by_sup, on="supplier_key", how="left")
+        .merge(marts["dim_supplier"][["supplier_key", "tier"]], on="supplier_key", how="left")
+    )
+    pairs[["shipments", "on_time", "sup_shipments", "sup_on_time"]] = (
+        pairs[["shipments", "on_time", "sup_shipments", "sup_on_time"]].fillna(0)
+    )
+
+    overall = (pairs["sup_on_time"] + 1) / (pairs["sup_shipments"] + 2)
+    pairs["score"] = (
+        (pairs["on_time"] + PRIOR_SHIPMENTS * overall) / (pairs["shipments"] + PRIOR_SHIPMENTS)
+    ).round(4)
+    pairs["tier"] = pairs["tier"].fillna(99)
+    pairs = pairs.sort_values(
+        ["part_key", "score", "shipments", "tier", "supplier_key"],
+        ascending=[True, False, False, True, True],
+    )
+
+    # Rows are contiguous per part after the sort: slice plain lists at the
+    # boundaries instead of a per-group pandas loop.
+    part_keys = pairs["part_key"].astype(str).to_numpy()
+    bounds = np.flatnonzero(part_keys[1:] != part_keys[:-1]) + 1
+    starts = np.concatenate([[0], bounds]).tolist()
+    ends = np.concatenate([bounds, [len(part_keys)]]).tolist()
+    rows = [
+        {"supplier": s, "score": sc, "shipments": n}
+        for s, sc, n in zip(
+            pairs["supplier_key"].astype(str).tolist(),
+            pairs["score"].astype(float).tolist(),
+            pairs["shipments"].astype(int).tolist(),
+        )
+    ]
+    parts = {part_keys[a]: rows[a:b] for a, b in zip(starts, ends)} if len(part_keys) else {}
+
+    dim = marts["dim_supplier"].merge(by_sup, on="supplier_key", how="left").fillna(
+        {"sup_shipments": 0, "sup_on_time": 0}
+    )
+    suppliers = {
+        str(r.supplier_key): {
+            "name": r.supplier_name,
+            "tier": int(r.tier),
+            "country_code": r.country_code,
+            "shipments": int(r.sup_shipments),
+            "on_time_rate": round(r.sup_on_time / r.sup_shipments, 4) if r.sup_shipments else None,
+        }
+        for r in dim.itertuples(index=False)
+    }
+
+    return {"build_id": build_id, "suppliers": suppliers, "parts": parts}
+
+
+def write_alternatives(marts: Dict[str, pd.DataFrame], out_dir: str, build_id: str) -> str:
+    path = os.path.join(out_dir, ARTIFACT_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(build_alternatives(marts, build_id), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
@@ -0,0 +1,176 @@
+import json
+import os
+from typing import Any, Dict, List, Tuple
+
+import pandas as pd
+
+
+ARTIFACT_NAME = "supply_concentration.json"
+
+# Subcomponent levels followed when expanding a product's BOM
+MAX_BOM_DEPTH = 20
+
+
+def _supplier_weights(marts: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """(part_key, supplier_key, w): each part's supply split across its suppliers.
+
+    Shipped quantity when the part has shipment history, otherwise an equal
+    split over the approved sources. Weights sum to 1 per part.
+    """
+    ship = (
+        marts["f_shipment"].groupby(["part_key", "supplier_key"], as_index=False)["qty"].sum()
+    )
+    pairs = pd.concat([
+        marts["f_supplier_part"][["part_key", "supplier_key"]],
+        ship[["part_key", "supplier_key"]],
+    ]).drop_duplicates()
+    pairs = pairs.merge(ship, on=["part_key", "supplier_key"], how="left")
+    pairs["qty"] = pairs["qty"].fillna(0).clip(lower=0)
+
+    grp = pairs.groupby("part_key")
+    total = grp["qty"].transform("sum")
+    count = grp["qty"].transform("size")
+    pairs["w"] = (pairs["qty"] / total).where(total > 0, 1.0 / count)
+    return pairs[["part_key", "supplier_key", "w"]]
+
+
+def _shares(weights: pd.DataFrame, key: str, dim: str) -> pd.DataFrame:
+    # Sum weights per (key, dim value) and renormalise per key
+    s = weights.groupby([key, dim], as_index=False)["w"].sum()
+    s["w"] = s["w"] / s.groupby(key)["w"].transform("sum")
+    return s
+
+
+def _summary(shares: pd.DataFrame, key: str, dim: str, prefix: str) -> pd.DataFrame:
+    """Per key: HHI (sum of squared shares), number of values with a non-zero share, top value and its share."""
+    sq = shares.assign(sq=shares["w"] ** 2, nonzero=shares["w"] > 0)
+    hhi = sq.groupby(key).agg(**{f"{prefix}_hhi": ("sq", "sum"), f"{prefix}_count": ("nonzero", "sum")})
+    top = shares.sort_values([key, "w", dim], ascending=[True, False, True]).drop_duplicates(key)
+    top = top.set_index(key).rename(columns={dim: f"top_{prefix}", "w": f"top_{prefix}_share"})
+    return hhi.join(top[[f"top_{prefix}", f"top_{prefix}_share"]])
+
+
+def _bom_closure(marts: Dict[str, pd.DataFrame]) -> Tuple[pd.DataFrame, List[str]]:
+    """(product_key, part_key) for BOM parts and all their subcomponents.
+
+    Also returns the products whose BOM still had unexpanded levels after
+    MAX_BOM_DEPTH (their closure, and so their indices, are incomplete).
+    """
+    dep = marts["f_part_dependency"][["parent_part_key", "child_part_key"]].drop_duplicates()
+    frontier = marts["f_bom_component"][["product_key", "part_key"]].drop_duplicates()
+    seen = frontier
+    # One extra round only to detect whether the depth limit cut anything off
+    for depth in range(MAX_BOM_DEPTH + 1):
+        nxt = (
+            frontier.merge(dep, left_on="part_key", right_on="parent_part_key")
+            [["product_key", "child_part_key"]]
+            .rename(columns={"child_part_key": "part_key"})
+        )
+        # Anti-join against what we already have; this is also what stops cycles
+        nxt = nxt.merge(seen, how="left", indicator=True)
+        nxt = nxt[nxt["_merge"] == "left_only"][["product_key", "part_key"]].drop_duplicates()
+        if nxt.empty:
+            return seen, []
+        if depth == MAX_BOM_DEPTH:
+            return seen, sorted(nxt["product_key"].astype(str).unique().tolist())
+        seen = pd.concat([seen, nxt], ignore_index=True)
+        frontier = nxt
+    return seen, []
+
+
+def _table(df: pd.DataFrame) -> Dict[str, Any]:
+    # Field names once plus one positional row per key: about half the size of
+    # per-row dicts, and rows stay O(1) to look up once loaded.
+    # Left joins turn count columns with gaps into floats; keep them integral
+    counts = [c for c in df.columns if c.endswith("_count")]
+    df = df.astype({c: "Int64" for c in counts}).round(4)
+    df = df.astype(object).where(df.notna(), None)
+    return {"fields": list(df.columns), "rows": dict(zip(df.index.astype(str), df.values.tolist()))}
+
+
+def build_concentration(marts: Dict[str, pd.DataFrame], build_id: str) -> Dict[str, Any]:
+    """Herfindahl indices of supplier country and delivery region, per part and per product.
+
+    HHI is 1.0 when everything comes from one country/region and 1/n for an
+    even split over n. Products weight each part of their (multi-level) BOM
+    equally and also report their most concentrated part.
+    """
+    w = _supplier_weights(marts)
+    w = w.merge(marts["dim_supplier"][["supplier_key", "country_code"]], on="supplier_key", how="left")
+    w["country_code"] = w["country_code"].fillna("UNKNOWN")
+
+    # A supplier's weight is split evenly over the regions its facilities are in
+    sup_region = (
+        marts["f_supplier_facility"][["supplier_key", "facility_key"]]
+        .merge(marts["dim_facility"][["facility_key", "region_key"]], on="facility_key")
+        [["supplier_key", "region_key"]]
+        .drop_duplicates()
+    )
+    sup_region["split"] = 1.0 / sup_region.groupby("supplier_key")["region_key"].transform("size")
+    wr = w.merge(sup_region, on="supplier_key")
+    wr["w"] = wr["w"] * wr["split"]
+    # Suppliers without f_supplier_facility rows have no region: region shares
+    # are over the rest, and region_coverage says how much of the supply that is
+    has_region = w["supplier_key"].isin(sup_region["supplier_key"])
+    coverage = w["w"].where(has_region, 0.0).groupby(w["part_key"]).sum().rename("region_coverage")
+    no_facility = sorted(w.loc[~has_region, "supplier_key"].astype(str).unique().tolist())
+
+    part_country = _shares(w, "part_key", "country_code")
+    part_region = _shares(wr, "part_key", "region_key")
+    parts = (
+        _summary(part_country, "part_key", "country_code", "country")
+        .join(_summary(part_region, "part_key", "region_key", "region"), how="left")
+        .join(w.groupby("part_key").size().rename("suppliers"))
+        .join(coverage)
+    )
+
+    closure, truncated = _bom_closure(marts)
+    n_parts = closure.groupby("product_key").size().rename("parts")
+    per_part = 1.0 / n_parts
+
+    def product_shares(part_shares: pd.DataFrame, dim: str) -> pd.DataFrame:
+        s = closure.merge(part_shares, on="part_key")
+        s["w"] = s["w"] * s["product_key"].map(per_part)
+        return _shares(s, "product_key", dim)
+
+    worst = (
+        closure.merge(parts["country_hhi"].reset_index(), on="part_key")
+        .sort_values(["product_key", "country_hhi", "part_key"], ascending=[True, False, True])
+        .drop_duplicates("product_key")
+        .set_index("product_key")
+        .rename(columns={"part_key": "most_concentrated_part", "country_hhi": "max_part_country_hhi"})
+    )
+    # Supplied parts weigh equally in a product, so its coverage is their mean
+    product_coverage = (
+        closure.merge(coverage.reset_index(), on="part_key")
+        .groupby("product_key")["region_coverage"].mean()
+    )
+    products = (
+        _summary(product_shares(part_country, "country_code"), "product_key", "country_code", "country")
+        .join(_summary(product_shares(part_region, "region_key"), "product_key", "region_key", "region"), how="left")
+        .join(n_parts)
+        .join(worst)
+        .join(product_coverage)
+    )
+    products["bom_truncated"] = products.index.astype(str).isin(truncated)
+
+    return {
+        "build_id": build_id,
+        "parts": _table(parts),
+        "products": _table(products),
+        # Inputs the indices could not fully account for
+        "report": {
+            "suppliers_without_facility": no_facility,
+            "max_bom_depth": MAX_BOM_DEPTH,
+            "bom_truncated_products": truncated,
+        },
+    }
+
+
+def write_concentration(marts: Dict[str, pd.DataFrame], out_dir: str, build_id: str) -> str:
+    path = os.path.join(out_dir, ARTIFACT_NAME)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(build_concentration(marts, build_id), f, ensure_ascii=False, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
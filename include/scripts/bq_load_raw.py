@@ -37,6 +37,17 @@ SCHEMAS: dict[str, list[bigquery.SchemaField]] = {
         bigquery.SchemaField("supplier_id", "STRING"),
         bigquery.SchemaField("facility_id", "STRING"),
     ],
+    # Written by the GraphRAG API; often header-only, which autodetect cannot type
+    "shipments_posted": [
+        bigquery.SchemaField("shipment_id", "STRING"),
+        bigquery.SchemaField("ship_date", "DATE"),
+        bigquery.SchemaField("supplier_id", "STRING"),
+        bigquery.SchemaField("part_id", "STRING"),
+        bigquery.SchemaField("facility_id", "STRING"),
+        bigquery.SchemaField("qty", "INT64"),
+        bigquery.SchemaField("lead_time_days", "FLOAT64"),
+        bigquery.SchemaField("status", "STRING"),
+    ],
 }
 
 
@@ -52,7 +63,7 @@ def ensure_dataset(client: bigquery.Client, project: str, dataset: str, location
         print(f"Created dataset: {ds_id} (location={location})")
 
 
-def load_csvs(raw_dir: str, project: str, dataset: str, location: str):
+def load_csvs(raw_dir: str, project: str, dataset: str, location: str, tables: list[str] | None = None):
     client = bigquery.Client(project=project)
     ensure_dataset(client, project, dataset, location)
 
@@ -60,6 +71,10 @@ def load_csvs(raw_dir: str, project: str, dataset: str, location: str):
     if not csv_files:
         raise FileNotFoundError(f"No CSV files found in raw_dir={raw_dir}")
 
+    # Incremental runs only reload the tables whose CSVs changed
+    if tables is not None:
+        csv_files = [p for p in csv_files if Path(p).stem in set(tables)]
+
     for csv_path in csv_files:
         table_name = Path(csv_path).stem
         table_id = f"{project}.{dataset}.{table_name}"
@@ -100,9 +115,15 @@ def main():
     ap.add_argument("--project", default=os.environ["BQ_RAW_PROJECT"])
     ap.add_argument("--dataset", default=os.environ["BQ_RAW_DATASET"])
     ap.add_argument("--location", default=os.environ.get("BQ_LOCATION", "europe-west1"))
+    ap.add_argument(
+        "--tables",
+        nargs="*",
+        default=None,
+        help="Only load these tables (CSV stems). Default: every CSV in --raw-dir.",
+    )
     args = ap.parse_args()
 
-    load_csvs(args.raw_dir, args.project, args.dataset, args.location)
+    load_csvs(args.raw_dir, args.project, args.dataset, args.location, tables=args.tables)
 
 
 if __name__ == "__main__":
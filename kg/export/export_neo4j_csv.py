@@ -0,0 +1,224 @@
+import os
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import pandas as pd
+
+
+# Rows per pandas.to_csv chunk; keeps the formatting buffer small on big marts.
+CHUNK_ROWS = 200_000
+
+
+# Node files: label -> (mart, [(mart column, header field)]).
+# The first field is the :ID, namespaced by an ID space per label so the natural
+# warehouse keys can be used as-is and stay stable across exports.
+NODES: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {
+    "Supplier": ("dim_supplier", [
+        ("supplier_key", "supplierKey:ID(Supplier)"),
+        ("supplier_name", "name"),
+        ("tier", "tier:int"),
+        ("country_code", "countryCode"),
+    ]),
+    "Part": ("dim_part", [
+        ("part_key", "partKey:ID(Part)"),
+        ("part_name", "name"),
+        ("criticality", "criticality"),
+    ]),
+    "Product": ("dim_product", [
+        ("product_key", "productKey:ID(Product)"),
+        ("product_name", "name"),
+        ("category", "category"),
+    ]),
+    "Facility": ("dim_facility", [
+        ("facility_key", "facilityKey:ID(Facility)"),
+        ("facility_name", "name"),
+        ("facility_type", "facilityType"),
+    ]),
+    "Region": ("dim_region", [
+        ("region_key", "regionKey:ID(Region)"),
+        ("region_name", "name"),
+        ("country_code", "countryCode"),
+    ]),
+    "Shipment": ("f_shipment", [
+        ("shipment_id", "shipmentId:ID(Shipment)"),
+        ("ship_date", "shipDate:date"),
+        ("qty", "qty:long"),
+        ("lead_time_days", "leadTimeDays:int"),
+        ("status", "status"),
+    ]),
+    "Disruption": ("f_disruption", [
+        ("disruption_id", "disruptionId:ID(Disruption)"),
+        ("disruption_type", "disruptionType"),
+        ("start_date", "startDate:date"),
+        ("end_date", "endDate:date"),
+        ("severity", "severity:double"),
+    ]),
+}
+
+# Relationship files: type -> (mart, [(mart column, header field)]).
+# SUPPLIES / DELIVERS_TO are built separately (sourcing master data + shipments).
+RELATIONSHIPS: Dict[str, Tuple[str, List[Tuple[str, str]]]] = {
+    "LOCATED_IN": ("dim_facility", [
+        ("facility_key", ":START_ID(Facility)"),
+        ("region_key", ":END_ID(Region)"),
+    ]),
+    "USED_IN": ("f_bom_component", [
+        ("part_key", ":START_ID(Part)"),
+        ("product_key", ":END_ID(Product)"),
+        ("qty", "qty:int"),
+    ]),
+    "SUBCOMPONENT_OF": ("f_part_dependency", [
+        ("child_part_key", ":START_ID(Part)"),
+        ("parent_part_key", ":END_ID(Part)"),
+        ("qty", "qty:int"),
+    ]),
+    "HAS_DISRUPTION": ("f_disruption", [
+        ("supplier_key", ":START_ID(Supplier)"),
+        ("disruption_id", ":END_ID(Disruption)"),
+    ]),
+    "FROM_SUPPLIER": ("f_shipment", [
+        ("shipment_id", ":START_ID(Shipment)"),
+        ("supplier_key", ":END_ID(Supplier)"),
+    ]),
+    "TO_FACILITY": ("f_shipment", [
+        ("shipment_id", ":START_ID(Shipment)"),
+        ("facility_key", ":END_ID(Facility)"),
+    ]),
+    "FOR_PART": ("f_shipment", [
+        ("shipment_id", ":START_ID(Shipment)"),
+        ("part_key", ":END_ID(Part)"),
+    ]),
+}
+
+
+def _typed(df: pd.DataFrame, fields: List[Tuple[str, str]]) -> pd.DataFrame:
+    """Select and rename columns, coercing each to its header type in one pass per column."""
+    out = pd.DataFrame(index=df.index)
+    for col, header in fields:
+        kind = header.rsplit(":", 1)[-1] if ":" in header.lstrip(":") else "string"
+        s = df[col]
+        if kind in ("int", "long"):
+            out[header] = pd.to_numeric(s, errors="coerce").round().astype("Int64")
+        elif kind == "double":
+            out[header] = pd.to_numeric(s, errors="coerce")
+        elif kind == "date":
+            out[header] = pd.to_datetime(s, errors="coerce").dt.strftime("%Y-%m-%d")
+        else:
+            out[header] = s.astype("string")
+    return out
+
+
+def _sourcing(pairs: pd.DataFrame, ship: pd.DataFrame, src: str, dst: str, src_space: str, dst_space: str) -> pd.DataFrame:
+    # One edge per (src, dst) across master data and shipments, carrying shipment aggregates.
+    agg = (
+        ship.groupby([src, dst], sort=False)
+        .agg(shipments=("shipment_id", "size"), qty=("qty", "sum"))
+        .reset_index()
+    )
+    edges = pd.concat([pairs[[src, dst]], agg[[src, dst]]]).drop_duplicates()
+    edges = edges.merge(agg, on=[src, dst], how="left")
+    return pd.DataFrame({
+        f":START_ID({src_space})": edges[src].astype("string"),
+        f":END_ID({dst_space})": edges[dst].astype("string"),
+        "shipments:int": edges["shipments"].fillna(0).astype("Int64"),
+        "totalQty:long": edges["qty"].fillna(0).astype("Int64"),
+    })
+
+
+def _known(df: pd.DataFrame, ids: Dict[str, pd.Series]) -> pd.Series:
+    # neo4j-admin aborts on an edge whose endpoint is not a node; mask those rows.
+    mask = pd.Series(True, index=df.index)
+    for header in df.columns[:2]:
+        space = header[header.index("(") + 1:-1]
+        mask &= df[header].isin(ids[space]).fillna(False).astype(bool)
+    return mask
+
+
+def _write(df: pd.DataFrame, out_dir: str, name: str) -> Tuple[str, str, int]:
+    """Write `<name>_header.csv` and `<name>.csv` (data only), return (header, data, bytes)."""
+    header_path = os.path.join(out_dir, f"{name}_header.csv")
+    data_path = os.path.join(out_dir, f"{name}.csv")
+    df.head(0).to_csv(header_path, index=False)
+    df.to_csv(data_path, index=False, header=False, chunksize=CHUNK_ROWS)
+    return header_path, data_path, os.path.getsize(data_path)
+
+
+def write_csvs(marts: Dict[str, pd.DataFrame], out_dir: str) -> Dict[str, object]:
+    """Write node/relationship CSVs for `neo4j-admin database import full`.
+
+    Relationship rows whose start or end key has no node are dropped and
+    counted per type. Returns the written files, the dropped counts and the
+    argument list for neo4j-admin.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    args: List[str] = []
+    files: Dict[str, str] = {}
+    ids: Dict[str, pd.Series] = {}
+    dropped: Dict[str, int] = {}
+    total = 0
+
+    for label, (mart, fields) in NODES.items():
+        df = _typed(marts[mart], fields).drop_duplicates(subset=[fields[0][1]])
+        ids[label] = df[fields[0][1]].dropna()
+        header, data, n = _write(df, out_dir, f"nodes_{label.lower()}")
+        args.append(f"--nodes={label}={header},{data}")
+        files[label] = data
+        total += n
+
+    ship = marts["f_shipment"]
+    rels = {
+        "SUPPLIES": _sourcing(
+            marts["f_supplier_part"], ship, "supplier_key", "part_key", "Supplier", "Part"
+        ),
+        "DELIVERS_TO": _sourcing(
+            marts["f_supplier_facility"], ship, "supplier_key", "facility_key", "Supplier", "Facility"
+        ),
+    }
+    for rel_type, (mart, fields) in RELATIONSHIPS.items():
+        rels[rel_type] = _typed(marts[mart], fields)
+
+    for rel_type, df in rels.items():
+        keep = _known(df, ids)
+        dropped[rel_type] = int((~keep).sum())
+        df = df[keep]
+        header, data, n = _write(df, out_dir, f"rels_{rel_type.lower()}")
+        args.append(f"--relationships={rel_type}={header},{data}")
+        files[rel_type] = data
+        total += n
+
+    with open(os.path.join(out_dir, "neo4j-admin-import.args"), "w") as f:
+        f.write("\n".join(args) + "\n")
+
+    return {"files": files, "args": args, "bytes": total, "dropped": dropped}
+
+
+def export_neo4j_csv(out_dir: str):
+    from export_supplychain_kg import read_marts
+
+    marts = read_marts()
+    t0 = time.perf_counter()
+    res = write_csvs(marts, out_dir)
+    print(
+        f"Wrote Neo4j import CSVs: {out_dir} "
+        f"({len(res['files'])} files, {res['bytes']} bytes, {time.perf_counter() - t0:.2f}s)"
+    )
+    bad = {k: v for k, v in res["dropped"].items() if v}
+    if bad:
+        print(f"Dropped relationships to unknown nodes: {bad}")
+    print("Import with:")
+    print("  neo4j-admin database import full --overwrite-destination \\")
+    for a in res["args"]:
+        print(f"    {a} \\")
+    print("    neo4j")
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--out-dir", required=True, help="Output directory for node/relationship CSVs")
+    args = ap.parse_args()
+    export_neo4j_csv(args.out_dir)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,17 @@
 import os
 import argparse
-from datetime import date
-from typing import Dict
+from datetime import date, datetime, timezone
+from typing import Dict, Optional
 
 import pandas as pd
 from google.cloud import bigquery
 from rdflib import Graph, Namespace, Literal
 from rdflib.namespace import RDF, RDFS, XSD
 
+from supplier_alternatives import write_alternatives
+from shipment_columns import write_shipments
+from supply_concentration import write_concentration
+
 
 SCR = Namespace("https://example.org/supplychain/kg#")
 
@@ -22,22 +26,42 @@ def _read_table(client: bigquery.Client, project: str, dataset: str, table: str)
     return client.query(q).to_dataframe()
 
 
-def export_ttl(out_path: str):
+MART_TABLES = [
+    "dim_supplier",
+    "dim_part",
+    "dim_product",
+    "dim_facility",
+    "dim_region",
+    "f_bom_component",
+    "f_part_dependency",
+    "f_shipment",
+    "f_disruption",
+    "f_supplier_part",
+    "f_supplier_facility",
+]
+
+
+def read_marts() -> Dict[str, pd.DataFrame]:
     project = os.environ["BQ_WH_PROJECT"]
     dataset = os.environ["BQ_WH_DATASET"]
 
     client = _bq_client()
+    return {t: _read_table(client, project, dataset, t) for t in MART_TABLES}
+
 
-    dim_supplier = _read_table(client, project, dataset, "dim_supplier")
-    dim_part = _read_table(client, project, dataset, "dim_part")
-    dim_product = _read_table(client, project, dataset, "dim_product")
-    dim_facility = _read_table(client, project, dataset, "dim_facility")
-    dim_region = _read_table(client, project, dataset, "dim_region")
+def build_graph(marts: Dict[str, pd.DataFrame], build_id: Optional[str] = None) -> Graph:
+    dim_supplier = marts["dim_supplier"]
+    dim_part = marts["dim_part"]
+    dim_product = marts["dim_product"]
+    dim_facility = marts["dim_facility"]
+    dim_region = marts["dim_region"]
 
-    f_bom = _read_table(client, project, dataset, "f_bom_component")
-    f_dep = _read_table(client, project, dataset, "f_part_dependency")
-    f_ship = _read_table(client, project, dataset, "f_shipment")
-    f_disr = _read_table(client, project, dataset, "f_disruption")
+    f_bom = marts["f_bom_component"]
+    f_dep = marts["f_part_dependency"]
+    f_ship = marts["f_shipment"]
+    f_disr = marts["f_disruption"]
+    f_sup_part = marts["f_supplier_part"]
+    f_sup_fac = marts["f_supplier_facility"]
 
     g = Graph()
     g.bind("scr", SCR)
@@ -100,6 +124,13 @@ def export_ttl(out_path: str):
         g.add((child, SCR.subcomponentOf, parent))
         g.add((child, SCR["depQty"], Literal(int(r["qty"]), datatype=XSD.integer)))
 
+    # Sourcing master data: every approved supplier of a part, shipped or not
+    for _, r in f_sup_part.iterrows():
+        g.add((uri("Supplier", r["supplier_key"]), SCR.supplies, uri("Part", r["part_key"])))
+
+    for _, r in f_sup_fac.iterrows():
+        g.add((uri("Supplier", r["supplier_key"]), SCR.deliversTo, uri("Facility", r["facility_key"])))
+
     # Shipments: link supplier supplies part; supplier delivers to facility
     for _, r in f_ship.iterrows():
         sup = uri("Supplier", r["supplier_key"])
@@ -131,16 +162,45 @@ def export_ttl(out_path: str):
         g.add((d, SCR["severity"], Literal(float(r["severity"]), datatype=XSD.decimal)))
         g.add((sup, SCR.hasDisruption, d))
 
-    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    # Build stamp: lets consumers (e.g. the GraphRAG API indexes) detect a reload.
+    # UTC timestamp so the latest build is also the lexicographic MAX.
+    build_id = build_id or new_build_id()
+    b = uri("KGBuild", build_id)
+    g.add((b, RDF.type, SCR.KGBuild))
+    g.add((b, SCR.buildId, Literal(build_id)))
+
+    return g
+
+
+def new_build_id() -> str:
+    return datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+
+
+def export_ttl(out_path: str, build_id: Optional[str] = None):
+    marts = read_marts()
+    build_id = build_id or new_build_id()
+    g = build_graph(marts, build_id)
+
+    out_dir = os.path.dirname(out_path)
+    os.makedirs(out_dir, exist_ok=True)
     g.serialize(destination=out_path, format="turtle")
     print(f"Wrote TTL: {out_path} (triples={len(g)})")
 
+    # Side artifacts for the GraphRAG API, stamped with the same build id
+    alt_path = write_alternatives(marts, out_dir, build_id)
+    print(f"Wrote alternative-supplier index: {alt_path}")
+    conc_path = write_concentration(marts, out_dir, build_id)
+    print(f"Wrote supply concentration index: {conc_path}")
+    ship_path = write_shipments(marts, out_dir, build_id)
+    print(f"Wrote columnar shipments: {ship_path}")
+
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", required=True, help="Output TTL path")
+    ap.add_argument("--build-id", default=None, help="scr:buildId to stamp (default: current UTC time)")
     args = ap.parse_args()
-    export_ttl(args.out)
+    export_ttl(args.out, build_id=args.build_id)
 
 
 if __name__ == "__main__":
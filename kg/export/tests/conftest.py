@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The exporters are run as scripts from kg/export (and include/kg/export)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
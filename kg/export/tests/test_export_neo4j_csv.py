@@ -0,0 +1,152 @@
+import datetime
+
+import pandas as pd
+import pytest
+
+from export_neo4j_csv import NODES, RELATIONSHIPS, _sourcing, _typed, write_csvs
+
+
+@pytest.fixture
+def marts():
+    return {
+        "dim_supplier": pd.DataFrame({
+            "supplier_key": ["S1", "S2", "S1"],
+            "supplier_name": ["Astra", "Borealis", "Astra"],
+            "tier": [1, 2, 1],
+            "country_code": ["DE", "CN", "DE"],
+        }),
+        "dim_part": pd.DataFrame({
+            "part_key": ["P1", "P2"],
+            "part_name": ["Bolt", "Nut"],
+            "criticality": ["HIGH", "LOW"],
+        }),
+        "dim_product": pd.DataFrame({
+            "product_key": ["PR1"],
+            "product_name": ["Kettle"],
+            "category": ["Small Appliance"],
+        }),
+        "dim_facility": pd.DataFrame({
+            "facility_key": ["F1"],
+            "facility_name": ["Plant 1"],
+            "facility_type": ["PLANT"],
+            "region_key": ["R1"],
+        }),
+        "dim_region": pd.DataFrame({
+            "region_key": ["R1"],
+            "region_name": ["Iberia"],
+            "country_code": ["ES"],
+        }),
+        "f_bom_component": pd.DataFrame({
+            "product_key": ["PR1", "PR1"],
+            "part_key": ["P1", "P9"],
+            "qty": [2, 1],
+        }),
+        "f_part_dependency": pd.DataFrame({
+            "parent_part_key": ["P1"],
+            "child_part_key": ["P2"],
+            "qty": [4],
+        }),
+        "f_supplier_part": pd.DataFrame({
+            "supplier_key": ["S1", "S2"],
+            "part_key": ["P1", "P1"],
+        }),
+        "f_supplier_facility": pd.DataFrame({
+            "supplier_key": ["S1"],
+            "facility_key": ["F1"],
+        }),
+        "f_shipment": pd.DataFrame({
+            "shipment_id": ["SH1", "SH2", "SH3"],
+            "ship_date": [datetime.date(2024, 1, 5), datetime.date(2024, 2, 1), datetime.date(2024, 2, 3)],
+            "supplier_key": ["S1", "S1", "S2"],
+            "part_key": ["P1", "P1", "P2"],
+            "facility_key": ["F1", "F1", "F1"],
+            "qty": [10, 5, 7],
+            "lead_time_days": [3, 4, 9],
+            "status": ["ON_TIME", "LATE", "ON_TIME"],
+        }),
+        "f_disruption": pd.DataFrame({
+            "disruption_id": ["D1"],
+            "supplier_key": ["S2"],
+            "disruption_type": ["FLOOD"],
+            "start_date": ["2024-03-01"],
+            "end_date": [None],
+            "severity": ["0.75"],
+        }),
+    }
+
+
+def read_rel(out_dir, name):
+    header = pd.read_csv(out_dir / f"rels_{name}_header.csv").columns.tolist()
+    return pd.read_csv(out_dir / f"rels_{name}.csv", names=header, dtype=str, keep_default_na=False)
+
+
+def test_typed_coerces_to_header_types():
+    df = pd.DataFrame({
+        "k": ["A", "B"],
+        "n": ["3", "x"],
+        "f": [1.6, None],
+        "d": [datetime.date(2024, 1, 5), "not a date"],
+    })
+    out = _typed(df, [("k", "key:ID(X)"), ("n", "n:int"), ("f", "f:double"), ("d", "d:date")])
+    assert out.columns.tolist() == ["key:ID(X)", "n:int", "f:double", "d:date"]
+    assert str(out["key:ID(X)"].dtype) == "string"
+    assert out["n:int"].tolist() == [3, pd.NA]
+    assert str(out["n:int"].dtype) == "Int64"
+    assert out["f:double"].iloc[0] == 1.6 and pd.isna(out["f:double"].iloc[1])
+    assert out["d:date"].iloc[0] == "2024-01-05" and pd.isna(out["d:date"].iloc[1])
+
+
+def test_sourcing_merges_master_pairs_and_shipments(marts):
+    edges = _sourcing(
+        marts["f_supplier_part"], marts["f_shipment"], "supplier_key", "part_key", "Supplier", "Part"
+    )
+    # S1-P1 is approved and shipped twice; S2-P1 is approved but never shipped;
+    # S2-P2 only appears in shipments
+    assert edges.to_dict("records") == [
+        {":START_ID(Supplier)": "S1", ":END_ID(Part)": "P1", "shipments:int": 2, "totalQty:long": 15},
+        {":START_ID(Supplier)": "S2", ":END_ID(Part)": "P1", "shipments:int": 0, "totalQty:long": 0},
+        {":START_ID(Supplier)": "S2", ":END_ID(Part)": "P2", "shipments:int": 1, "totalQty:long": 7},
+    ]
+
+
+def test_write_csvs_headers_and_args(marts, tmp_path):
+    res = write_csvs(marts, str(tmp_path))
+    assert set(res["files"]) == set(NODES) | set(RELATIONSHIPS) | {"SUPPLIES", "DELIVERS_TO"}
+
+    header = (tmp_path / "nodes_disruption_header.csv").read_text().strip()
+    assert header == "disruptionId:ID(Disruption),disruptionType,startDate:date,endDate:date,severity:double"
+    assert (tmp_path / "nodes_disruption.csv").read_text() == "D1,FLOOD,2024-03-01,,0.75\n"
+    assert (tmp_path / "rels_supplies_header.csv").read_text().strip() == (
+        ":START_ID(Supplier),:END_ID(Part),shipments:int,totalQty:long"
+    )
+
+    args = (tmp_path / "neo4j-admin-import.args").read_text().splitlines()
+    assert args == res["args"]
+    assert f"--nodes=Supplier={tmp_path}/nodes_supplier_header.csv,{tmp_path}/nodes_supplier.csv" in args
+    assert f"--relationships=SUPPLIES={tmp_path}/rels_supplies_header.csv,{tmp_path}/rels_supplies.csv" in args
+
+
+def test_node_ids_are_natural_keys_and_stable(marts, tmp_path):
+    write_csvs(marts, str(tmp_path / "a"))
+    write_csvs(marts, str(tmp_path / "b"))
+    # the duplicated S1 dim row is written once, keyed by its warehouse key
+    assert (tmp_path / "a" / "nodes_supplier.csv").read_text() == "S1,Astra,1,DE\nS2,Borealis,2,CN\n"
+    for f in (tmp_path / "a").iterdir():
+        assert f.read_text().replace(str(tmp_path / "a"), "") == (
+            (tmp_path / "b" / f.name).read_text().replace(str(tmp_path / "b"), "")
+        )
+
+
+def test_relationships_to_unknown_nodes_are_dropped(marts, tmp_path):
+    res = write_csvs(marts, str(tmp_path))
+    # P9 is not in dim_part; S2-P2 ships a known part, so SUPPLIES keeps all edges
+    assert res["dropped"]["USED_IN"] == 1
+    assert read_rel(tmp_path, "used_in").values.tolist() == [["P1", "PR1", "2"]]
+    assert res["dropped"]["SUPPLIES"] == 0
+    assert sum(res["dropped"].values()) == 1
+
+    marts["f_shipment"].loc[2, "supplier_key"] = "S404"
+    res = write_csvs(marts, str(tmp_path))
+    assert res["dropped"]["FROM_SUPPLIER"] == 1
+    assert res["dropped"]["SUPPLIES"] == 1
+    assert read_rel(tmp_path, "from_supplier").values.tolist() == [["SH1", "S1"], ["SH2", "S1"]]
@@ -0,0 +1,68 @@
+import pandas as pd
+import pytest
+
+from supplier_alternatives import PRIOR_SHIPMENTS, build_alternatives
+
+
+def shipments(supplier, part, on_time, late):
+    return [(supplier, part, "ON_TIME")] * on_time + [(supplier, part, "LATE")] * late
+
+
+@pytest.fixture
+def marts():
+    return {
+        "dim_supplier": pd.DataFrame({
+            "supplier_key": ["S1", "S2", "S3", "S4", "S5"],
+            "supplier_name": ["Astra", "Borealis", "Cobalt", "Delta", "Echo"],
+            "tier": [1, 2, 1, 3, 1],
+            "country_code": ["DE", "CN", "US", "FR", "JP"],
+        }),
+        "f_supplier_part": pd.DataFrame({
+            "supplier_key": ["S1", "S2", "S3", "S4", "S5"],
+            "part_key": ["P1", "P1", "P1", "P3", "P3"],
+        }),
+        "f_shipment": pd.DataFrame(
+            shipments("S1", "P1", 2, 0) + shipments("S2", "P2", 10, 0) + shipments("S3", "P1", 0, 1),
+            columns=["supplier_key", "part_key", "status"],
+        ),
+    }
+
+
+def expected(on_time, shipments, sup_on_time, sup_shipments):
+    overall = (sup_on_time + 1) / (sup_shipments + 2)
+    return round((on_time + PRIOR_SHIPMENTS * overall) / (shipments + PRIOR_SHIPMENTS), 4)
+
+
+def test_part_history_is_shrunk_towards_overall_rate(marts):
+    out = build_alternatives(marts, "b1")
+    assert out["build_id"] == "b1"
+    # S2 never shipped P1 but has a strong overall record; S1 is 2/2 on P1;
+    # S3's single late shipment only pulls it part of the way down
+    assert out["parts"]["P1"] == [
+        {"supplier": "S2", "score": expected(0, 0, 10, 10), "shipments": 0},
+        {"supplier": "S1", "score": expected(2, 2, 2, 2), "shipments": 2},
+        {"supplier": "S3", "score": expected(0, 1, 0, 1), "shipments": 1},
+    ]
+
+
+def test_shippers_are_candidates_without_approval(marts):
+    assert [r["supplier"] for r in build_alternatives(marts, "b1")["parts"]["P2"]] == ["S2"]
+
+
+def test_ties_break_on_lower_tier(marts):
+    rows = build_alternatives(marts, "b1")["parts"]["P3"]
+    assert [r["supplier"] for r in rows] == ["S5", "S4"]
+    assert rows[0]["score"] == rows[1]["score"] == 0.5
+
+
+def test_supplier_summary(marts):
+    sup = build_alternatives(marts, "b1")["suppliers"]
+    assert sup["S1"] == {"name": "Astra", "tier": 1, "country_code": "DE", "shipments": 2, "on_time_rate": 1.0}
+    assert sup["S3"]["on_time_rate"] == 0.0
+    assert sup["S4"]["shipments"] == 0 and sup["S4"]["on_time_rate"] is None
+
+
+def test_no_shipments_at_all(marts):
+    marts["f_shipment"] = marts["f_shipment"].iloc[:0]
+    out = build_alternatives(marts, "b1")
+    assert {r["score"] for rows in out["parts"].values() for r in rows} == {0.5}
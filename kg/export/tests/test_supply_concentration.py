@@ -0,0 +1,88 @@
+import pandas as pd
+import pytest
+
+import supply_concentration
+from supply_concentration import build_concentration
+
+
+@pytest.fixture
+def marts():
+    # X is built from P1 with subcomponent P2; Y from the chain Q0 <- Q1 <- Q2
+    return {
+        "dim_supplier": pd.DataFrame({
+            "supplier_key": ["S1", "S2", "S3", "S4"],
+            "country_code": ["DE", "DE", "CN", "US"],
+        }),
+        "dim_facility": pd.DataFrame({"facility_key": ["F1", "F2"], "region_key": ["R1", "R2"]}),
+        "f_supplier_facility": pd.DataFrame({"supplier_key": ["S1", "S2", "S3"], "facility_key": ["F1", "F2", "F1"]}),
+        "f_supplier_part": pd.DataFrame({
+            "supplier_key": ["S1", "S2", "S3", "S4", "S1", "S3", "S1"],
+            "part_key": ["P1", "P1", "P2", "P2", "P3", "P3", "Q0"],
+        }),
+        # P3 only ever shipped from S1, so S3's approved source has zero weight
+        "f_shipment": pd.DataFrame({"supplier_key": ["S1"], "part_key": ["P3"], "qty": [10]}),
+        "f_bom_component": pd.DataFrame({"product_key": ["X", "Y"], "part_key": ["P1", "Q0"]}),
+        "f_part_dependency": pd.DataFrame({"parent_part_key": ["P1", "Q0", "Q1"], "child_part_key": ["P2", "Q1", "Q2"]}),
+    }
+
+
+def rows(table):
+    return {k: dict(zip(table["fields"], v)) for k, v in table["rows"].items()}
+
+
+def test_part_indices(marts):
+    parts = rows(build_concentration(marts, "b1")["parts"])
+    assert parts["P1"]["country_hhi"] == 1.0 and parts["P1"]["country_count"] == 1
+    assert parts["P1"]["region_hhi"] == 0.5 and parts["P1"]["region_count"] == 2
+    assert parts["P2"]["country_hhi"] == 0.5 and parts["P2"]["top_country_share"] == 0.5
+    assert parts["P1"]["suppliers"] == 2
+
+
+def test_counts_skip_zero_shares(marts):
+    p3 = rows(build_concentration(marts, "b1")["parts"])["P3"]
+    assert (p3["country_hhi"], p3["country_count"], p3["top_country"]) == (1.0, 1, "DE")
+    assert (p3["region_hhi"], p3["region_count"]) == (1.0, 1)
+    assert p3["suppliers"] == 2
+
+
+def test_suppliers_without_facility_are_reported(marts):
+    out = build_concentration(marts, "b1")
+    p2 = rows(out["parts"])["P2"]
+    # Region shares cover S3 only, half of P2's supply
+    assert (p2["region_hhi"], p2["region_count"], p2["region_coverage"]) == (1.0, 1, 0.5)
+    assert rows(out["parts"])["P1"]["region_coverage"] == 1.0
+    assert out["report"]["suppliers_without_facility"] == ["S4"]
+
+
+def test_product_aggregates_multi_level_bom(marts):
+    x = rows(build_concentration(marts, "b1")["products"])["X"]
+    # P1 is all DE, P2 half CN and half US; both parts weigh 1/2
+    assert x["parts"] == 2
+    assert (x["country_hhi"], x["country_count"], x["top_country"]) == (0.375, 3, "DE")
+    assert (x["most_concentrated_part"], x["max_part_country_hhi"]) == ("P1", 1.0)
+    assert x["region_coverage"] == 0.75
+    assert x["bom_truncated"] is False
+
+
+def test_bom_truncation_is_reported(marts, monkeypatch):
+    out = build_concentration(marts, "b1")
+    assert out["report"]["bom_truncated_products"] == []
+    assert rows(out["products"])["Y"]["parts"] == 3
+
+    monkeypatch.setattr(supply_concentration, "MAX_BOM_DEPTH", 1)
+    out = build_concentration(marts, "b1")
+    assert out["report"]["bom_truncated_products"] == ["Y"]
+    assert out["report"]["max_bom_depth"] == 1
+    products = rows(out["products"])
+    assert products["Y"]["parts"] == 2 and products["Y"]["bom_truncated"] is True
+    assert products["X"]["bom_truncated"] is False
+
+
+def test_bom_cycles_terminate(marts):
+    marts["f_part_dependency"] = pd.concat([
+        marts["f_part_dependency"],
+        pd.DataFrame({"parent_part_key": ["P2"], "child_part_key": ["P1"]}),
+    ])
+    out = build_concentration(marts, "b1")
+    assert rows(out["products"])["X"]["parts"] == 2
+    assert out["report"]["bom_truncated_products"] == []
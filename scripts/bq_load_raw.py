@@ -6,6 +6,21 @@ from pathlib import Path
 from google.cloud import bigquery
 
 
+# Written by the GraphRAG API; often header-only, which autodetect cannot type
+SCHEMAS = {
+    "shipments_posted": [
+        bigquery.SchemaField("shipment_id", "STRING"),
+        bigquery.SchemaField("ship_date", "DATE"),
+        bigquery.SchemaField("supplier_id", "STRING"),
+        bigquery.SchemaField("part_id", "STRING"),
+        bigquery.SchemaField("facility_id", "STRING"),
+        bigquery.SchemaField("qty", "INT64"),
+        bigquery.SchemaField("lead_time_days", "FLOAT64"),
+        bigquery.SchemaField("status", "STRING"),
+    ],
+}
+
+
 def ensure_dataset(client: bigquery.Client, project: str, dataset: str, location: str = "EU"):
     ds_id = f"{project}.{dataset}"
     try:
@@ -26,9 +41,11 @@ def load_csvs(raw_dir: str, project: str, dataset: str):
         job_config = bigquery.LoadJobConfig(
             source_format=bigquery.SourceFormat.CSV,
             skip_leading_rows=1,
-            autodetect=True,
+            autodetect=table_name not in SCHEMAS,
             write_disposition=bigquery.WriteDisposition.WRITE_TRUNCATE,
         )
+        if table_name in SCHEMAS:
+            job_config.schema = SCHEMAS[table_name]
         with open(csv_path, "rb") as f:
             job = client.load_table_from_file(f, table_id, job_config=job_config)
         job.result()
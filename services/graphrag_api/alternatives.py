@@ -0,0 +1,70 @@
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from kg import SCR_NS, VersionedCache, load_artifact
+from metrics import stage
+
+
+ARTIFACT_NAME = "supplier_alternatives.json"
+
+
+def _key(uri: str) -> str:
+    return uri.rsplit("/", 1)[-1]
+
+
+class AlternativeIndex:
+    """Part -> ranked suppliers, precomputed by the KG exporter.
+
+    Lists are already sorted best-first, so substitutes for one part are the
+    first `k` entries that are not excluded: no graph query at request time.
+    """
+
+    def __init__(self, data: Optional[Dict[str, Any]]):
+        data = data or {}
+        self.build_id: Optional[str] = data.get("build_id")
+        self.suppliers: Dict[str, Dict[str, Any]] = data.get("suppliers", {})
+        self.parts: Dict[str, List[Dict[str, Any]]] = data.get("parts", {})
+
+    def __len__(self) -> int:
+        return len(self.parts)
+
+    def substitutes(self, part_key: str, exclude: Iterable[str] = (), k: int = 3) -> List[Dict[str, Any]]:
+        skip = set(exclude)
+        out = []
+        for c in self.parts.get(part_key, ()):
+            if c["supplier"] in skip:
+                continue
+            sup = self.suppliers.get(c["supplier"], {})
+            out.append({
+                "uri": f"{SCR_NS}Supplier/{c['supplier']}",
+                "label": sup.get("name", c["supplier"]),
+                "tier": sup.get("tier"),
+                "country_code": sup.get("country_code"),
+                "on_time_rate": sup.get("on_time_rate"),
+                "part_shipments": c["shipments"],
+                "score": c["score"],
+            })
+            if len(out) >= k:
+                break
+        return out
+
+    def for_failed_supplier(self, supplier_uri: str, part_uris: Iterable[str], k: int = 3) -> Dict[str, List[Dict[str, Any]]]:
+        """{part uri: substitutes} for the parts a failed supplier provides."""
+        failed = _key(supplier_uri)
+        return {p: self.substitutes(_key(p), exclude=(failed,), k=k) for p in part_uris}
+
+
+def load_alternative_index(endpoint: str) -> AlternativeIndex:
+    # Written next to the TTL by the exporter; reloaded with the KG build stamp.
+    with stage("alternatives_load"):
+        return AlternativeIndex(load_artifact(ARTIFACT_NAME))
+
+
+_CACHE: VersionedCache[AlternativeIndex] = VersionedCache(
+    load_alternative_index,
+    check_interval_s=float(os.environ.get("ALTERNATIVES_REFRESH_S", "60")),
+)
+
+
+def get_alternative_index(endpoint: str) -> AlternativeIndex:
+    return _CACHE.get(endpoint)
@@ -1,17 +1,89 @@
 import os
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
+import time
 
-from rag import impact_analysis
+from datetime import date
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from pydantic import BaseModel, Field
+
+import metrics
+from concentration import KINDS as CONCENTRATION_KINDS, concentration_lookup
+from rag import RELATIONS, impact_analysis, impact_export, impact_page
+from scenario import scenario_analysis
+from shipment_store import DIMENSIONS as SHIPMENT_DIMENSIONS, ingest_shipments, shipment_performance
+from simulation import SYNC_MAX_RUNS, SimulationQueueFull, simulate_risk, simulation_job, submit_simulation
+from supplier_index import get_supplier_index
 
 app = FastAPI(title="Supply Chain GraphRAG API", version="0.1.0")
 
 
+@app.middleware("http")
+async def trace_and_time(request: Request, call_next):
+    # Reuse the caller's trace id when given so it can be grepped in Fuseki logs
+    # (it is sent as a SPARQL comment + header on every query of this request).
+    trace_id = request.headers.get(metrics.TRACE_HEADER) or metrics.new_trace_id()
+    metrics.begin_trace(trace_id)
+
+    method = request.method
+    metrics.REQUESTS_IN_FLIGHT.labels(method).inc()
+    t0 = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        metrics.REQUESTS_IN_FLIGHT.labels(method).dec()
+        route = request.scope.get("route")
+        path = getattr(route, "path", "unmatched")
+        metrics.REQUEST_SECONDS.labels(method, path, str(status)).observe(time.perf_counter() - t0)
+
+    response.headers[metrics.TRACE_HEADER] = trace_id
+    return response
+
+
 class ImpactRequest(BaseModel):
     supplier_name: str
     top_k_parts: int = 10
     top_k_products: int = 10
     top_k_regions: int = 10
+    # Ranked substitute suppliers returned per directly supplied part
+    top_k_alternatives: int = 3
+    # Shortest supplier -> part -> ... -> product chains per impacted product
+    paths_per_product: int = Field(3, ge=1, le=20)
+    include_timings: bool = False
+
+
+class ScenarioRequest(BaseModel):
+    # Supplier labels (typos tolerated) or KG URIs, all failing at the same time
+    suppliers: List[str] = Field(..., min_length=1)
+    limit: int = Field(1000, ge=1, le=10000)
+
+
+class Shipment(BaseModel):
+    # Same columns as the f_shipment mart
+    shipment_id: str
+    ship_date: date
+    supplier_key: str
+    part_key: str
+    facility_key: str
+    qty: int = 0
+    lead_time_days: Optional[float] = None
+    status: Optional[str] = None
+
+
+class ShipmentBatch(BaseModel):
+    shipments: List[Shipment] = Field(..., min_length=1)
+
+
+class SimulationRequest(BaseModel):
+    runs: int = Field(10000, ge=1, le=1_000_000)
+    horizon_days: float = Field(90.0, gt=0)
+    seed: Optional[int] = None
+    # Capped at SIM_WORKERS (default: all cores); the process pool is shared
+    workers: Optional[int] = Field(None, ge=1)
+    top_k: int = Field(20, ge=1, le=1000)
 
 
 @app.get("/health")
@@ -19,18 +91,178 @@ def health():
     return {"status": "ok"}
 
 
+@app.get("/metrics")
+def prometheus_metrics():
+    return Response(content=metrics.render_latest(), media_type=metrics.CONTENT_TYPE)
+
+
+@app.get("/suppliers/search")
+def suppliers_search(q: str = Query(..., min_length=1), limit: int = Query(10, ge=1, le=100)):
+    endpoint = os.environ.get("SPARQL_ENDPOINT")
+    if not endpoint:
+        raise HTTPException(status_code=500, detail="SPARQL_ENDPOINT env var not set")
+    try:
+        index = get_supplier_index(endpoint)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return {"query": q, "results": index.search(q, limit)}
+
+
 @app.post("/impact")
 def impact(req: ImpactRequest):
+    t0 = time.perf_counter()
     try:
-        return impact_analysis(
+        out = impact_analysis(
             supplier_name=req.supplier_name,
             top_k_parts=req.top_k_parts,
             top_k_products=req.top_k_products,
-            top_k_regions=req.top_k_products,
+            top_k_regions=req.top_k_regions,
+            top_k_alternatives=req.top_k_alternatives,
+            paths_per_product=req.paths_per_product,
             sparql_endpoint=os.environ.get("SPARQL_ENDPOINT"),
             hf_model=os.environ.get("HF_MODEL_NAME", "google/flan-t5-base"),
             hf_token=os.environ.get("HUGGINGFACE_TOKEN") or None,
         )
     except Exception as e:
-        # JSON error for curl/jq
+        # JSON error for curl/jq; the X-Trace-Id header identifies the failing call
+        raise HTTPException(status_code=500, detail=str(e))
+
+    if req.include_timings:
+        out["timings"] = {
+            "trace_id": metrics.current_trace_id(),
+            "total_ms": round((time.perf_counter() - t0) * 1000.0, 3),
+            "stages_ms": metrics.current_timings(),
+        }
+    return out
+
+
+@app.get("/impact/export")
+def impact_export_ndjson(supplier_name: str = Query(..., min_length=1)):
+    endpoint = os.environ.get("SPARQL_ENDPOINT")
+    if not endpoint:
+        raise HTTPException(status_code=500, detail="SPARQL_ENDPOINT env var not set")
+    return StreamingResponse(
+        impact_export(supplier_name, endpoint),
+        media_type="application/x-ndjson",
+    )
+
+
+@app.get("/impact/{relation}")
+def impact_relation_page(
+    relation: str,
+    supplier_name: str = Query(..., min_length=1),
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = None,
+):
+    if relation not in RELATIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown relation: {relation}")
+    try:
+        return impact_page(
+            supplier_name=supplier_name,
+            relation=relation,
+            limit=limit,
+            cursor=cursor,
+            sparql_endpoint=os.environ.get("SPARQL_ENDPOINT"),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/impact/scenario")
+def impact_scenario(req: ScenarioRequest):
+    try:
+        return scenario_analysis(
+            suppliers=req.suppliers,
+            sparql_endpoint=os.environ.get("SPARQL_ENDPOINT"),
+            limit=req.limit,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/simulate")
+def simulate(req: SimulationRequest):
+    # Small runs answer inline; larger ones are queued and polled via GET /simulate/{job_id}
+    kwargs = dict(
+        sparql_endpoint=os.environ.get("SPARQL_ENDPOINT"),
+        runs=req.runs,
+        horizon_days=req.horizon_days,
+        seed=req.seed,
+        workers=req.workers,
+        top_k=req.top_k,
+    )
+    try:
+        if req.runs <= SYNC_MAX_RUNS:
+            return simulate_risk(**kwargs)
+        job = submit_simulation(**kwargs)
+    except SimulationQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+    return JSONResponse(status_code=202, content={**job, "poll": f"/simulate/{job['job_id']}"})
+
+
+@app.get("/simulate/{job_id}")
+def simulate_job(job_id: str):
+    try:
+        return simulation_job(job_id)
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+
+
+@app.get("/concentration/{kind}/{key:path}")
+def concentration(kind: str, key: str):
+    # Herfindahl indices of supplier country / delivery region for one part or
+    # product, read from the artifact the KG export writes (no SPARQL).
+    if kind not in CONCENTRATION_KINDS:
+        raise HTTPException(status_code=404, detail=f"Unknown kind: {kind}")
+    try:
+        return concentration_lookup(kind, key, os.environ.get("SPARQL_ENDPOINT"))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/shipments")
+def shipments_ingest(req: ShipmentBatch):
+    # New shipments become visible to /performance immediately and are logged
+    # for the DAG, which loads them into f_shipment with the next run.
+    try:
+        return ingest_shipments(
+            [s.model_dump() for s in req.shipments],
+            os.environ.get("SPARQL_ENDPOINT"),
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.get("/performance/{dimension}/{key:path}")
+def performance(
+    dimension: str,
+    key: str,
+    window_days: int = Query(90, ge=1, le=3650),
+    as_of: Optional[date] = None,
+    points: int = Query(0, ge=0, le=520),
+    step_days: int = Query(7, ge=1, le=365),
+):
+    if dimension not in SHIPMENT_DIMENSIONS:
+        raise HTTPException(status_code=404, detail=f"Unknown dimension: {dimension}")
+    try:
+        return shipment_performance(
+            dimension,
+            key,
+            os.environ.get("SPARQL_ENDPOINT"),
+            window_days=window_days,
+            as_of=as_of,
+            points=points,
+            step_days=step_days,
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
+    except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,62 @@
+import os
+from typing import Any, Dict, Optional
+
+from kg import SCR_NS, VersionedCache, load_artifact
+from metrics import stage
+
+
+ARTIFACT_NAME = "supply_concentration.json"
+
+# Artifact table -> KG class of its keys
+KINDS = {"parts": "Part", "products": "Product"}
+
+
+class ConcentrationIndex:
+    """Per-part / per-product Herfindahl indices precomputed by the KG exporter."""
+
+    def __init__(self, data: Optional[Dict[str, Any]]):
+        data = data or {}
+        self.build_id: Optional[str] = data.get("build_id")
+        self.tables: Dict[str, Dict[str, Any]] = {k: data.get(k, {}) for k in KINDS}
+
+    @property
+    def available(self) -> bool:
+        return self.build_id is not None
+
+    def lookup(self, kind: str, key: str) -> Optional[Dict[str, Any]]:
+        """`key` is the warehouse key (C10, P100) or the KG URI."""
+        key = key.rsplit("/", 1)[-1]
+        table = self.tables[kind]
+        row = table.get("rows", {}).get(key)
+        if row is None:
+            return None
+        out = {"uri": f"{SCR_NS}{KINDS[kind]}/{key}", "key": key}
+        out.update(zip(table["fields"], row))
+        return out
+
+
+def load_concentration_index(endpoint: str) -> ConcentrationIndex:
+    with stage("concentration_load"):
+        return ConcentrationIndex(load_artifact(ARTIFACT_NAME))
+
+
+_CACHE: VersionedCache[ConcentrationIndex] = VersionedCache(
+    load_concentration_index,
+    check_interval_s=float(os.environ.get("CONCENTRATION_REFRESH_S", "60")),
+)
+
+
+def get_concentration_index(endpoint: str) -> ConcentrationIndex:
+    return _CACHE.get(endpoint)
+
+
+def concentration_lookup(kind: str, key: str, sparql_endpoint: Optional[str]) -> Dict[str, Any]:
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+    index = get_concentration_index(sparql_endpoint)
+    if not index.available:
+        raise LookupError("Concentration index not exported yet (run the KG export)")
+    item = index.lookup(kind, key)
+    if item is None:
+        raise LookupError(f"No concentration data for {kind[:-1]} {key}")
+    return {"build_id": index.build_id, **item}
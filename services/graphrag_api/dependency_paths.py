@@ -0,0 +1,135 @@
+import os
+from collections import deque
+from typing import Any, Dict, Iterable, List, Optional
+
+from supply_graph import SupplyGraph
+
+
+MAX_DEPTH = int(os.environ.get("PATHS_MAX_DEPTH", "8"))
+MAX_EXPANDED = int(os.environ.get("PATHS_MAX_EXPANDED", "20000"))
+
+
+def k_shortest_paths(
+    graph: SupplyGraph,
+    supplier: int,
+    products: Optional[Iterable[int]] = None,
+    k: int = 3,
+    max_depth: int = MAX_DEPTH,
+    max_expanded: int = MAX_EXPANDED,
+) -> Dict[str, Any]:
+    """Up to `k` shortest supplier -> part -> (subcomponentOf)* -> product chains per product.
+
+    BFS over queue entries (part, parent entry, depth) instead of plain nodes:
+    each part may be expanded up to `k` times, so the first k entries that
+    reach a product are its k shortest chains (by hop count). An entry never
+    revisits a part already on its own chain, which keeps cyclic BOMs finite.
+    `max_depth` caps the number of parts on a chain and `max_expanded` the
+    total expansions; `search` reports whether either cut the search short.
+    `products=None` explains every reachable product.
+    """
+    wanted = None if products is None else set(int(p) for p in products)
+    found: Dict[int, List[int]] = {}
+
+    node: List[int] = []
+    parent: List[int] = []
+    depth: List[int] = []
+    expansions = [0] * graph.n_parts
+
+    def push(part: int, from_entry: int, d: int) -> None:
+        node.append(part)
+        parent.append(from_entry)
+        depth.append(d)
+        queue.append(len(node) - 1)
+
+    def on_chain(entry: int, part: int) -> bool:
+        while entry >= 0:
+            if node[entry] == part:
+                return True
+            entry = parent[entry]
+        return False
+
+    queue: deque = deque()
+    for p in graph.supplier_parts[supplier]:
+        push(p, -1, 1)
+
+    expanded = cycles = complete = 0
+    depth_limited = expansion_limited = False
+    while queue and (wanted is None or complete < len(wanted)):
+        e = queue.popleft()
+        part = node[e]
+        if expansions[part] >= k:
+            continue
+        if expanded >= max_expanded:
+            expansion_limited = True
+            break
+        expansions[part] += 1
+        expanded += 1
+
+        for prod in graph.part_products[part]:
+            if (wanted is None or prod in wanted) and len(found.setdefault(prod, [])) < k:
+                found[prod].append(e)
+                complete += len(found[prod]) == k
+
+        up = graph.part_parents[part]
+        if up and depth[e] >= max_depth:
+            depth_limited = True
+            continue
+        for q in up:
+            if expansions[q] >= k:
+                continue
+            if on_chain(e, q):
+                cycles += 1
+                continue
+            push(q, e, depth[e] + 1)
+
+    def chain(entry: int) -> List[int]:
+        parts = []
+        while entry >= 0:
+            parts.append(node[entry])
+            entry = parent[entry]
+        return parts[::-1]
+
+    return {
+        "paths": {prod: [chain(e) for e in entries] for prod, entries in found.items()},
+        "search": {
+            "expanded": expanded,
+            "max_depth": max_depth,
+            "max_expanded": max_expanded,
+            "depth_limited": depth_limited,
+            "expansion_limited": expansion_limited,
+            "cycles_skipped": cycles,
+            # Products asked for but not reached (maybe only beyond the limits)
+            "unreached": sorted(wanted - set(found)) if wanted is not None else [],
+        },
+    }
+
+
+def explain_paths(
+    graph: SupplyGraph,
+    supplier_uri: str,
+    product_uris: Iterable[str],
+    k: int = 3,
+) -> Dict[str, Any]:
+    """k_shortest_paths keyed and labelled by URI, for API responses and evidence."""
+    s = graph.supplier_id.get(supplier_uri)
+    product_uris = list(product_uris)
+    if s is None:
+        return {"paths": {}, "search": {"error": "supplier not in the cached supply graph"}}
+    ids = [graph.product_id[u] for u in product_uris if u in graph.product_id]
+    res = k_shortest_paths(graph, s, ids, k=k)
+
+    def node(kind: str, i: int) -> Dict[str, str]:
+        uris, labels = getattr(graph, f"{kind}_uris"), getattr(graph, f"{kind}_labels")
+        return {"uri": uris[i], "label": labels[i]}
+
+    paths = {
+        graph.product_uris[prod]: [
+            [node("supplier", s)] + [node("part", p) for p in chain] + [node("product", prod)]
+            for chain in chains
+        ]
+        for prod, chains in res["paths"].items()
+    }
+    search = dict(res["search"])
+    search["unreached"] = [graph.product_uris[i] for i in search["unreached"]]
+    search["unreached"] += [u for u in product_uris if u not in graph.product_id]
+    return {"paths": paths, "search": search}
@@ -0,0 +1,173 @@
+import csv
+import io
+import json
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Iterator, List, Optional, TypeVar
+
+import requests
+from SPARQLWrapper import SPARQLWrapper, JSON
+
+from metrics import TRACE_HEADER, current_trace_id
+
+
+SCR_NS = "https://example.org/supplychain/kg#"
+
+# Side artifacts written by the KG exporter next to the TTL (same build id)
+ARTIFACT_DIR = os.environ.get("KG_ARTIFACT_DIR", "/opt/project/data/kg")
+
+PREFIXES = """
+PREFIX scr: <https://example.org/supplychain/kg#>
+PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
+""".strip()
+
+
+def sparql_select(endpoint: str, query: str, timeout_s: int = 30) -> List[Dict[str, Any]]:
+    sp = SPARQLWrapper(endpoint)
+    trace_id = current_trace_id()
+    if trace_id:
+        # Fuseki logs the query text, so the comment ties its log lines to our trace.
+        query = f"# trace_id={trace_id}\n{query}"
+        sp.addCustomHttpHeader(TRACE_HEADER, trace_id)
+    sp.setQuery(query)
+    sp.setReturnFormat(JSON)
+
+    # Some SPARQLWrapper builds may not have setTimeout; keep safe.
+    if hasattr(sp, "setTimeout"):
+        sp.setTimeout(timeout_s)
+
+    try:
+        res = sp.query().convert()
+    except Exception as e:
+        raise RuntimeError(f"SPARQL query failed against {endpoint}: {e}")
+
+    return res.get("results", {}).get("bindings", [])
+
+
+def sparql_select_stream(endpoint: str, query: str, timeout_s: int = 300) -> Iterator[Dict[str, Any]]:
+    """Like sparql_select, but yields rows while Fuseki is still sending them.
+
+    Uses the SPARQL CSV result format over a streamed HTTP response, so memory
+    stays flat however many rows the query returns. Unbound variables are
+    omitted, matching the JSON bindings shape ({"var": {"value": ...}}).
+    """
+    headers = {"Accept": "text/csv"}
+    trace_id = current_trace_id()
+    if trace_id:
+        query = f"# trace_id={trace_id}\n{query}"
+        headers[TRACE_HEADER] = trace_id
+
+    try:
+        r = requests.post(endpoint, data={"query": query}, headers=headers, stream=True, timeout=timeout_s)
+        r.raise_for_status()
+    except Exception as e:
+        raise RuntimeError(f"SPARQL query failed against {endpoint}: {e}")
+
+    with r:
+        r.raw.decode_content = True
+        reader = csv.reader(io.TextIOWrapper(r.raw, encoding="utf-8", newline=""))
+        header = next(reader, None)
+        if header is None:
+            return
+        for values in reader:
+            yield {k: {"value": v} for k, v in zip(header, values) if v != ""}
+
+
+def kg_version(endpoint: str) -> str:
+    # The exporter stamps every build with scr:buildId (sortable UTC timestamp).
+    # Fuseki loads append, so the latest build wins. Older KGs without a stamp
+    # fall back to the supplier count, which still changes on most reloads.
+    q = PREFIXES + """
+SELECT (MAX(STR(?b)) AS ?build) (COUNT(?s) AS ?suppliers) WHERE {
+  { ?x a scr:KGBuild ; scr:buildId ?b }
+  UNION
+  { ?s a scr:Supplier }
+}
+"""
+    rows = sparql_select(endpoint, q)
+    row = rows[0] if rows else {}
+    build = row.get("build", {}).get("value")
+    if build:
+        return build
+    return "count:" + row.get("suppliers", {}).get("value", "0")
+
+
+T = TypeVar("T")
+
+
+class VersionedCache(Generic[T]):
+    """Holds one value built from the KG and rebuilds it when the KG version changes.
+
+    Once a value exists, callers never wait on Fuseki: at most once per
+    `check_interval_s` a background thread probes the version (one cheap
+    SPARQL query) and rebuilds if it changed, while requests keep getting
+    the current value. Only the first build runs in the caller.
+    """
+
+    def __init__(self, build: Callable[[str], T], check_interval_s: float = 60.0):
+        self._build = build
+        self._check_interval_s = check_interval_s
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._value: Optional[T] = None
+        self._version: Optional[str] = None
+        self._endpoint: Optional[str] = None
+        self._checked_at = 0.0
+        self._refreshing = False
+
+    def get(self, endpoint: str) -> T:
+        with self._lock:
+            current = self._value if self._endpoint == endpoint else None
+            stale = time.monotonic() - self._checked_at >= self._check_interval_s
+            start = current is not None and stale and not self._refreshing
+            if start:
+                self._refreshing = True
+        if current is not None:
+            if start:
+                threading.Thread(target=self._refresh_in_background, args=(endpoint,), daemon=True).start()
+            return current
+
+        with self._refresh_lock:
+            # Another thread may have built it while we waited
+            with self._lock:
+                if self._value is not None and self._endpoint == endpoint:
+                    return self._value
+            return self._refresh(endpoint)
+
+    def _refresh(self, endpoint: str) -> T:
+        # Called with _refresh_lock held
+        version = kg_version(endpoint)
+        with self._lock:
+            value = self._value if self._endpoint == endpoint and version == self._version else None
+        if value is None:
+            value = self._build(endpoint)
+        with self._lock:
+            self._value = value
+            self._version = version
+            self._endpoint = endpoint
+            self._checked_at = time.monotonic()
+        return value
+
+    def _refresh_in_background(self, endpoint: str) -> None:
+        try:
+            with self._refresh_lock:
+                self._refresh(endpoint)
+        except Exception:
+            # Keep serving the current value; retried after check_interval_s
+            logging.getLogger(__name__).exception("KG cache refresh failed (%s)", endpoint)
+            with self._lock:
+                self._checked_at = time.monotonic()
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+
+def load_artifact(name: str) -> Optional[Dict[str, Any]]:
+    """Parsed JSON artifact from ARTIFACT_DIR, or None if it was not exported yet."""
+    path = os.path.join(ARTIFACT_DIR, name)
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
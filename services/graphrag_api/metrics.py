@@ -0,0 +1,89 @@
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+
+
+# SPARQL round-trips sit in the 5ms-5s range; generation on CPU can take a minute.
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+
+STAGE_SECONDS = Histogram(
+    "graphrag_stage_seconds",
+    "Wall time per pipeline stage (supplier lookup, SPARQL queries, LLM).",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "graphrag_stage_errors_total",
+    "Exceptions raised per pipeline stage.",
+    ["stage"],
+)
+STAGE_IN_FLIGHT = Gauge(
+    "graphrag_stage_in_flight",
+    "Stages currently executing.",
+    ["stage"],
+)
+REQUEST_SECONDS = Histogram(
+    "graphrag_request_seconds",
+    "End-to-end HTTP request time.",
+    ["method", "path", "status"],
+    buckets=_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "graphrag_requests_in_flight",
+    "HTTP requests currently being served.",
+    ["method"],
+)
+
+TRACE_HEADER = "X-Trace-Id"
+
+_trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("timings", default=None)
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex
+
+
+def begin_trace(trace_id: str) -> None:
+    # Called once per request before the handler runs. The timings dict is
+    # shared by reference, so stages running in worker threads still fill it.
+    _trace_id.set(trace_id)
+    _timings.set({})
+
+
+def current_trace_id() -> Optional[str]:
+    return _trace_id.get()
+
+
+def current_timings() -> Dict[str, float]:
+    """Per-stage milliseconds recorded for the current request."""
+    return dict(_timings.get() or {})
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    STAGE_IN_FLIGHT.labels(name).inc()
+    t0 = time.perf_counter()
+    try:
+        yield
+    except Exception:
+        STAGE_ERRORS.labels(name).inc()
+        raise
+    finally:
+        elapsed = time.perf_counter() - t0
+        STAGE_IN_FLIGHT.labels(name).dec()
+        STAGE_SECONDS.labels(name).observe(elapsed)
+        timings = _timings.get()
+        if timings is not None:
+            timings[name] = round(timings.get(name, 0.0) + elapsed * 1000.0, 3)
+
+
+def render_latest() -> bytes:
+    return generate_latest()
+
+
+CONTENT_TYPE = CONTENT_TYPE_LATEST
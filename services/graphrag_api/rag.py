@@ -1,44 +1,161 @@
+import base64
 import json
+import math
 import textwrap
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
-from SPARQLWrapper import SPARQLWrapper, JSON
 from transformers import pipeline
 
+from alternatives import get_alternative_index
+from dependency_paths import explain_paths
+from kg import PREFIXES, kg_version, sparql_select as _sparql_select, sparql_select_stream
+from metrics import stage
+from supplier_index import get_supplier_index
+from supply_graph import get_supply_graph
 
-PREFIXES = """
-PREFIX scr: <https://example.org/supplychain/kg#>
-PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-""".strip()
 
+def _resolve_supplier(endpoint: str, supplier_name: str) -> Optional[Dict[str, Any]]:
+    # Served from the in-process label index (exact, then unambiguous fuzzy),
+    # so typos resolve and Fuseki is not asked to lowercase every label.
+    with stage("supplier_lookup"):
+        return get_supplier_index(endpoint).resolve(supplier_name)
 
-def _sparql_select(endpoint: str, query: str) -> List[Dict[str, Any]]:
-    sp = SPARQLWrapper(endpoint)
-    sp.setQuery(query)
-    sp.setReturnFormat(JSON)
 
-    # Some SPARQLWrapper builds may not have setTimeout; keep safe.
-    if hasattr(sp, "setTimeout"):
-        sp.setTimeout(30)
+RELATIONS = ("parts", "products", "regions")
 
+# Part criticality as a sortable rank (unknown values sort last)
+_CRIT_RANK = """COALESCE(IF(?crit = "HIGH", 0, IF(?crit = "MEDIUM", 1, IF(?crit = "LOW", 2, 3))), 3)"""
+
+
+# ORDER BY keys per relation: (variable, descending, numeric). Every key is
+# always bound (labels via COALESCE, IRIs via STR) and the tuple ends in
+# IRIs, so the order is total and a page can resume after the last row's
+# keys (keyset pagination) instead of re-reading everything before it.
+_SORT_KEYS = {
+    "parts": [("critRank", False, True), ("volume", True, True), ("sortLabel", False, False), ("key", False, False)],
+    "products": [
+        ("critRank", False, True), ("direct", True, True), ("sortLabel", False, False),
+        ("key", False, False), ("key2", False, False),
+    ],
+    "regions": [("volume", True, True), ("sortLabel", False, False), ("key", False, False), ("key2", False, False)],
+}
+
+
+def _literal(value: Any, numeric: bool) -> str:
+    if numeric:
+        # Integers stay exact (volumes can exceed a double's 53 bits)
+        try:
+            return str(int(value))
+        except ValueError:
+            f = float(value)
+        if not math.isfinite(f):
+            raise ValueError(value)
+        return repr(f)
+    if not isinstance(value, str):
+        raise TypeError(value)
+    s = value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n").replace("\r", "\\r")
+    return f'"{s}"'
+
+
+def _after(relation: str, last: List[Any]) -> str:
+    """FILTER keeping rows that sort strictly after the key tuple `last`."""
+    keys = _SORT_KEYS[relation]
+    if len(last) != len(keys):
+        raise ValueError("Malformed cursor")
     try:
-        res = sp.query().convert()
-    except Exception as e:
-        raise RuntimeError(f"SPARQL query failed against {endpoint}: {e}")
+        values = [_literal(v, numeric) for v, (_, _, numeric) in zip(last, keys)]
+    except (TypeError, ValueError):
+        raise ValueError("Malformed cursor")
+    # (a, b, c) > (A, B, C)  ==  a > A || (a = A && (b > B || (b = B && c > C)))
+    cond = ""
+    for (var, desc, _), v in reversed(list(zip(keys, values))):
+        step = f"?{var} {'<' if desc else '>'} {v}"
+        cond = f"{step} || (?{var} = {v} && ({cond}))" if cond else step
+    return f"  FILTER({cond})\n"
+
+
+def _order_by(relation: str) -> str:
+    return "ORDER BY " + " ".join(
+        f"DESC(?{var})" if desc else f"?{var}" for var, desc, _ in _SORT_KEYS[relation]
+    ) + "\n"
 
-    return res.get("results", {}).get("bindings", [])
+
+def _sort_key(relation: str, row: Dict[str, Any]) -> List[Any]:
+    return [row[var]["value"] for var, _, _ in _SORT_KEYS[relation]]
+
+
+def _relation_query(relation: str, supplier_uri: str, after: Optional[List[Any]] = None) -> str:
+    # `after`: sort key of the last row already returned (see _SORT_KEYS)
+    cont = _after(relation, after) if after else ""
+    if relation == "parts":
+        # Parts directly supplied, most critical and highest shipped volume first
+        return PREFIXES + f"""
+SELECT ?part ?partLabel ?crit ?volume ?critRank ?sortLabel ?key WHERE {{
+  {{
+    SELECT ?part (SUM(COALESCE(?qty, 0)) AS ?volume) WHERE {{
+      <{supplier_uri}> scr:supplies ?part .
+      OPTIONAL {{ ?sh scr:fromSupplier <{supplier_uri}> ; scr:forPart ?part ; scr:qty ?qty }}
+    }} GROUP BY ?part
+  }}
+  OPTIONAL {{ ?part rdfs:label ?partLabel }}
+  OPTIONAL {{ ?part scr:criticality ?crit }}
+  BIND({_CRIT_RANK} AS ?critRank)
+  BIND(STR(COALESCE(?partLabel, "")) AS ?sortLabel)
+  BIND(STR(?part) AS ?key)
+{cont}}}
+""" + _order_by(relation)
+    if relation == "products":
+        # Products impacted via multi-tier dependency:
+        # supplier supplies part -> (subcomponentOf)* -> basePart -> usedIn -> product
+        # Ranked by the criticality of the BOM component, then direct (tier-0) first.
+        return PREFIXES + f"""
+SELECT ?product ?productLabel ?basePart ?basePartLabel ?crit ?direct ?critRank ?sortLabel ?key ?key2 WHERE {{
+  {{
+    SELECT ?product ?basePart (MAX(IF(?part = ?basePart, 1, 0)) AS ?direct) WHERE {{
+      <{supplier_uri}> scr:supplies ?part .
+      ?part (scr:subcomponentOf)* ?basePart .
+      ?basePart scr:usedIn ?product .
+    }} GROUP BY ?product ?basePart
+  }}
+  OPTIONAL {{ ?product rdfs:label ?productLabel }}
+  OPTIONAL {{ ?basePart rdfs:label ?basePartLabel }}
+  OPTIONAL {{ ?basePart scr:criticality ?crit }}
+  BIND({_CRIT_RANK} AS ?critRank)
+  BIND(STR(COALESCE(?productLabel, "")) AS ?sortLabel)
+  BIND(STR(?product) AS ?key)
+  BIND(STR(?basePart) AS ?key2)
+{cont}}}
+""" + _order_by(relation)
+    if relation == "regions":
+        # Regions impacted via deliveries: supplier -> deliversTo facility -> locatedIn region,
+        # ranked by the volume the supplier ships to that facility
+        return PREFIXES + f"""
+SELECT ?region ?regionLabel ?facility ?facilityLabel ?volume ?sortLabel ?key ?key2 WHERE {{
+  {{
+    SELECT ?facility (SUM(COALESCE(?qty, 0)) AS ?volume) WHERE {{
+      <{supplier_uri}> scr:deliversTo ?facility .
+      OPTIONAL {{ ?sh scr:fromSupplier <{supplier_uri}> ; scr:toFacility ?facility ; scr:qty ?qty }}
+    }} GROUP BY ?facility
+  }}
+  ?facility scr:locatedIn ?region .
+  OPTIONAL {{ ?region rdfs:label ?regionLabel }}
+  OPTIONAL {{ ?facility rdfs:label ?facilityLabel }}
+  BIND(STR(COALESCE(?regionLabel, "")) AS ?sortLabel)
+  BIND(STR(?region) AS ?key)
+  BIND(STR(?facility) AS ?key2)
+{cont}}}
+""" + _order_by(relation)
+    raise ValueError(f"Unknown relation: {relation}")
 
 
-def _get_supplier_uri(endpoint: str, supplier_name: str) -> Optional[str]:
-    q = PREFIXES + f"""
-SELECT ?s WHERE {{
-  ?s a scr:Supplier ;
-     rdfs:label ?lbl .
-  FILTER(LCASE(STR(?lbl)) = LCASE({json.dumps(supplier_name)}))
-}} LIMIT 5
-"""
-    rows = _sparql_select(endpoint, q)
-    return rows[0]["s"]["value"] if rows else None
+def _relation_page(
+    endpoint: str, relation: str, supplier_uri: str, limit: int, after: Optional[List[Any]] = None
+):
+    """One ordered page plus whether more rows follow (fetches limit + 1)."""
+    q = _relation_query(relation, supplier_uri, after) + f"LIMIT {int(limit) + 1}\n"
+    with stage(f"sparql_{relation}"):
+        rows = _sparql_select(endpoint, q)
+    return rows[:limit], len(rows) > limit
 
 
 def _top_impacts(
@@ -48,43 +165,131 @@ def _top_impacts(
     top_k_products: int,
     top_k_regions: int,
 ):
-    # Parts directly supplied
-    q_parts = PREFIXES + f"""
-SELECT DISTINCT ?part ?partLabel WHERE {{
-  <{supplier_uri}> scr:supplies ?part .
-  OPTIONAL {{ ?part rdfs:label ?partLabel }}
-}} LIMIT {int(top_k_parts)}
-"""
-
-    # Products impacted via multi-tier dependency:
-    # supplier supplies part -> (subcomponentOf)* -> basePart -> usedIn -> product
-    q_products = PREFIXES + f"""
-SELECT DISTINCT ?product ?productLabel ?basePart ?basePartLabel WHERE {{
-  <{supplier_uri}> scr:supplies ?part .
-  ?part (scr:subcomponentOf)* ?basePart .
-  ?basePart scr:usedIn ?product .
-  OPTIONAL {{ ?product rdfs:label ?productLabel }}
-  OPTIONAL {{ ?basePart rdfs:label ?basePartLabel }}
-}} LIMIT {int(top_k_products)}
-"""
+    parts, more_parts = _relation_page(endpoint, "parts", supplier_uri, top_k_parts)
+    products, more_products = _relation_page(endpoint, "products", supplier_uri, top_k_products)
+    regions, more_regions = _relation_page(endpoint, "regions", supplier_uri, top_k_regions)
+    more = {"parts": more_parts, "products": more_products, "regions": more_regions}
+    return parts, products, regions, more
+
+
+def _label(row, uri_key, label_key):
+    uri = row[uri_key]["value"]
+    return row.get(label_key, {}).get("value", uri.split("/")[-1])
 
-    # Regions impacted via deliveries: supplier -> deliversTo facility -> locatedIn region
-    q_regions = PREFIXES + f"""
-SELECT DISTINCT ?region ?regionLabel ?facility ?facilityLabel WHERE {{
-  <{supplier_uri}> scr:deliversTo ?facility .
-  ?facility scr:locatedIn ?region .
-  OPTIONAL {{ ?region rdfs:label ?regionLabel }}
-  OPTIONAL {{ ?facility rdfs:label ?facilityLabel }}
-}} LIMIT {int(top_k_regions)}
-"""
 
-    parts = _sparql_select(endpoint, q_parts)
-    products = _sparql_select(endpoint, q_products)
-    regions = _sparql_select(endpoint, q_regions)
-    return parts, products, regions
+def _num(row, key):
+    v = row.get(key, {}).get("value")
+    return int(float(v)) if v else 0
 
 
-def _format_evidence(parts, products, regions) -> str:
+def _item(relation: str, r) -> Dict[str, Any]:
+    if relation == "parts":
+        return {
+            "uri": r["part"]["value"],
+            "label": _label(r, "part", "partLabel"),
+            "criticality": r.get("crit", {}).get("value"),
+            "shipped_qty": _num(r, "volume"),
+        }
+    if relation == "products":
+        return {
+            "uri": r["product"]["value"],
+            "label": _label(r, "product", "productLabel"),
+            "via_component": _label(r, "basePart", "basePartLabel"),
+            "via_component_criticality": r.get("crit", {}).get("value"),
+            "direct": bool(_num(r, "direct")),
+        }
+    return {
+        "uri": r["region"]["value"],
+        "label": _label(r, "region", "regionLabel"),
+        "via_facility": _label(r, "facility", "facilityLabel"),
+        "shipped_qty": _num(r, "volume"),
+    }
+
+
+def encode_cursor(relation: str, supplier_uri: str, last: Dict[str, Any], version: Optional[str]) -> str:
+    """Cursor resuming after row `last`: its ORDER BY keys plus the KG build they belong to."""
+    raw = json.dumps(
+        {"r": relation, "s": supplier_uri, "k": _sort_key(relation, last), "v": version},
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Dict[str, Any]:
+    try:
+        pad = "=" * (-len(cursor) % 4)
+        c = json.loads(base64.urlsafe_b64decode(cursor + pad))
+    except Exception:
+        raise ValueError("Malformed cursor")
+    if not isinstance(c, dict) or not isinstance(c.get("k"), list):
+        raise ValueError("Malformed cursor")
+    return c
+
+
+def impact_page(
+    supplier_name: str,
+    relation: str,
+    limit: int,
+    cursor: Optional[str],
+    sparql_endpoint: Optional[str],
+) -> Dict[str, Any]:
+    """Cursor-paginated listing of one impact relation."""
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+    if relation not in RELATIONS:
+        raise ValueError(f"Unknown relation: {relation}")
+
+    match = _resolve_supplier(sparql_endpoint, supplier_name)
+    if not match:
+        return {"error": f"Supplier not found in KG: {supplier_name}"}
+    supplier_uri = match["uri"]
+
+    after, version = None, None
+    if cursor:
+        c = decode_cursor(cursor)
+        if c.get("r") != relation or c.get("s") != supplier_uri:
+            raise ValueError("Cursor does not belong to this supplier/relation")
+        # Probe Fuseki itself: cached indexes may lag a reload by their refresh interval
+        version = kg_version(sparql_endpoint)
+        if c.get("v") != version:
+            raise ValueError("Cursor expired: the KG was reloaded, restart from the first page")
+        after = c["k"]
+
+    rows, more = _relation_page(sparql_endpoint, relation, supplier_uri, limit, after)
+    next_cursor = None
+    if more:
+        version = version or kg_version(sparql_endpoint)
+        next_cursor = encode_cursor(relation, supplier_uri, rows[-1], version)
+    return {
+        "supplier": {"uri": supplier_uri, "label": match["label"]},
+        "relation": relation,
+        "items": [_item(relation, r) for r in rows],
+        "next_cursor": next_cursor,
+    }
+
+
+def impact_export(supplier_name: str, sparql_endpoint: Optional[str]) -> Iterator[str]:
+    """Full impact listing as NDJSON lines, streamed relation by relation.
+
+    Rows are pulled from Fuseki as a CSV stream and written out one at a time,
+    so memory does not grow with the size of the impact set.
+    """
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+    match = _resolve_supplier(sparql_endpoint, supplier_name)
+    if not match:
+        yield json.dumps({"error": f"Supplier not found in KG: {supplier_name}"}) + "\n"
+        return
+
+    yield json.dumps({"supplier": {"uri": match["uri"], "label": match["label"]}}, ensure_ascii=False) + "\n"
+    for relation in RELATIONS:
+        q = _relation_query(relation, match["uri"])
+        for r in sparql_select_stream(sparql_endpoint, q):
+            yield json.dumps({"relation": relation, **_item(relation, r)}, ensure_ascii=False) + "\n"
+
+
+def _format_evidence(parts, products, regions, alternatives=None, paths=None) -> str:
     def lbl(row, uri_key, label_key):
         uri = row[uri_key]["value"]
         return row.get(label_key, {}).get("value", uri.split("/")[-1])
@@ -104,6 +309,28 @@ def _format_evidence(parts, products, regions) -> str:
         reg = lbl(r, "region", "regionLabel")
         fac = lbl(r, "facility", "facilityLabel")
         lines.append(f"  - {reg} (via {fac})")
+    if paths and paths["paths"]:
+        lines.append("- Dependency chains (shortest first):")
+        for chains in paths["paths"].values():
+            for chain in chains:
+                lines.append("  - " + " -> ".join(n["label"] for n in chain))
+        search = paths["search"]
+        if search.get("depth_limited") or search.get("expansion_limited"):
+            lines.append("  - (path search hit its limits; longer chains may exist)")
+    if alternatives:
+        lines.append("- Alternative suppliers per part (ranked by expected on-time rate for that part):")
+        for r in parts:
+            alts = alternatives.get(r["part"]["value"])
+            if not alts:
+                lines.append(f"  - {lbl(r, 'part', 'partLabel')}: no other known source (single-sourced)")
+                continue
+            opts = "; ".join(
+                f"{a['label']} (tier {a['tier']}, {a['country_code']}, {a['score']:.0%} expected on time, "
+                + (f"{a['part_shipments']} shipments of this part" if a["part_shipments"] else "never shipped this part")
+                + ")"
+                for a in alts
+            )
+            lines.append(f"  - {lbl(r, 'part', 'partLabel')}: {opts}")
     return "\n".join(lines)
 
 
@@ -122,13 +349,15 @@ def _llm_summarize(model_name: str, token: Optional[str], supplier_name: str, ev
     4) Mitigations (3-5 bullets)
     """).strip()
 
-    gen = pipeline(
-        "text2text-generation",
-        model=model_name,
-        tokenizer=model_name,
-        token=token,
-    )
-    out = gen(prompt, max_length=1024, do_sample=False)
+    with stage("pipeline_build"):
+        gen = pipeline(
+            "text2text-generation",
+            model=model_name,
+            tokenizer=model_name,
+            token=token,
+        )
+    with stage("generation"):
+        out = gen(prompt, max_length=1024, do_sample=False)
     return out[0]["generated_text"]
 
 
@@ -140,22 +369,56 @@ def impact_analysis(
     sparql_endpoint: Optional[str],
     hf_model: str,
     hf_token: Optional[str],
+    top_k_alternatives: int = 3,
+    paths_per_product: int = 3,
 ) -> Dict[str, Any]:
     if not sparql_endpoint:
         raise RuntimeError("SPARQL_ENDPOINT env var not set")
 
-    supplier_uri = _get_supplier_uri(sparql_endpoint, supplier_name)
-    if not supplier_uri:
+    match = _resolve_supplier(sparql_endpoint, supplier_name)
+    if not match:
+        suggestions = get_supplier_index(sparql_endpoint).fuzzy(supplier_name, limit=5)
         return {
             "error": f"Supplier not found in KG: {supplier_name}",
             "hint": "Check exact label in suppliers.csv or confirm KG load into Fuseki.",
+            "suggestions": [h["label"] for h in suggestions],
         }
+    supplier_uri = match["uri"]
 
-    parts, products, regions = _top_impacts(
+    parts, products, regions, more = _top_impacts(
         sparql_endpoint, supplier_uri, top_k_parts, top_k_products, top_k_regions
     )
 
-    evidence = _format_evidence(parts, products, regions)
+    # Substitutes come from the exporter's precomputed index (empty if it was not built).
+    # Like the LLM step, the enrichments below never fail the core impact result.
+    alternatives: Dict[str, Any] = {}
+    alternatives_error = None
+    try:
+        with stage("alternatives_lookup"):
+            alt_index = get_alternative_index(sparql_endpoint)
+            if len(alt_index):
+                alternatives = alt_index.for_failed_supplier(
+                    supplier_uri, [r["part"]["value"] for r in parts], k=top_k_alternatives
+                )
+    except Exception as e:
+        alternatives_error = f"alternatives lookup failed: {e}"
+
+    # Concrete supplier -> part -> ... -> product chains for the listed products
+    # (the SPARQL only returns the BOM component the product was reached through)
+    try:
+        with stage("dependency_paths"):
+            paths = explain_paths(
+                get_supply_graph(sparql_endpoint),
+                supplier_uri,
+                dict.fromkeys(r["product"]["value"] for r in products),
+                k=paths_per_product,
+            )
+    except Exception as e:
+        paths = {"paths": {}, "search": {"error": f"supply graph unavailable: {e}"}}
+    if alternatives_error:
+        paths["search"]["alternatives_error"] = alternatives_error
+
+    evidence = _format_evidence(parts, products, regions, alternatives, paths)
 
     # Make LLM optional: still return graph results even if HF fails
     try:
@@ -163,32 +426,30 @@ def impact_analysis(
     except Exception as e:
         summary = f"(LLM summarization failed: {e})"
 
-    def _label(row, uri_key, label_key):
-        uri = row[uri_key]["value"]
-        return row.get(label_key, {}).get("value", uri.split("/")[-1])
+    # Continue any truncated relation with GET /impact/{relation}?cursor=...
+    version = kg_version(sparql_endpoint) if any(more.values()) else None
+    last = {"parts": parts, "products": products, "regions": regions}
+    next_cursors = {
+        rel: encode_cursor(rel, supplier_uri, last[rel][-1], version) if more[rel] else None
+        for rel in RELATIONS
+    }
 
     return {
-        "supplier": {"name": supplier_name, "uri": supplier_uri},
+        "supplier": {
+            "name": supplier_name,
+            "uri": supplier_uri,
+            "label": match["label"],
+            "match": match["match"],
+        },
         "impacted_parts": [
-            {"uri": r["part"]["value"], "label": _label(r, "part", "partLabel")}
-            for r in parts
-        ],
-        "impacted_products": [
-            {
-                "uri": r["product"]["value"],
-                "label": _label(r, "product", "productLabel"),
-                "via_component": _label(r, "basePart", "basePartLabel"),
-            }
-            for r in products
-        ],
-        "impacted_regions": [
-            {
-                "uri": r["region"]["value"],
-                "label": _label(r, "region", "regionLabel"),
-                "via_facility": _label(r, "facility", "facilityLabel"),
-            }
-            for r in regions
+            # null when no alternatives index was exported, [] when the part is single-sourced
+            {**_item("parts", r), "alternatives": alternatives.get(r["part"]["value"])} for r in parts
         ],
+        "impacted_products": [_item("products", r) for r in products],
+        "impacted_regions": [_item("regions", r) for r in regions],
+        "dependency_paths": paths["paths"],
+        "path_search": paths["search"],
+        "next_cursors": next_cursors,
         "evidence": evidence,
         "llm_summary": summary,
     }
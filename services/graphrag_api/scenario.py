@@ -0,0 +1,108 @@
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from metrics import stage
+from supplier_index import get_supplier_index
+from supply_graph import SupplyGraph, get_supply_graph
+
+
+def evaluate_scenario(graph: SupplyGraph, failed_ids: List[int], limit: int = 1000) -> Dict[str, Any]:
+    """Which parts and products are lost when all `failed_ids` suppliers are down.
+
+    A part is lost when every one of its suppliers failed, or when any of its
+    subcomponents is lost. A product is lost when any BOM part is lost.
+    """
+    failed = np.zeros((1, graph.n_suppliers), dtype=bool)
+    failed[0, failed_ids] = True
+
+    unsupplied = graph.unsupplied_parts(failed)
+    lost = graph.propagate_up(unsupplied)[0]
+    products_lost = graph.products_of(lost[None, :])[0]
+    unsupplied = unsupplied[0]
+
+    # Critical parts whose one and only supplier is in the scenario
+    single_source = unsupplied & graph.critical & (graph.supplier_count == 1)
+
+    def part_row(p: int) -> Dict[str, Any]:
+        return {
+            "uri": graph.part_uris[p],
+            "label": graph.part_labels[p],
+            "criticality": graph.part_criticality[p],
+            "cause": "no_remaining_supplier" if unsupplied[p] else "subcomponent_lost",
+            "supplier_count": int(graph.supplier_count[p]),
+        }
+
+    def rank(p: int):
+        return (not graph.critical[p], not unsupplied[p], graph.part_labels[p], graph.part_uris[p])
+
+    lost_ids = sorted(np.flatnonzero(lost).tolist(), key=rank)
+    product_ids = sorted(
+        np.flatnonzero(products_lost).tolist(),
+        key=lambda i: (graph.product_labels[i], graph.product_uris[i]),
+    )
+
+    single_ids = sorted(np.flatnonzero(single_source).tolist(), key=rank)
+
+    products = []
+    for i in product_ids[:limit]:
+        via = [int(p) for p in graph.bom_parts(i) if lost[p]]
+        products.append({
+            "uri": graph.product_uris[i],
+            "label": graph.product_labels[i],
+            "via_parts": [graph.part_labels[p] for p in sorted(via, key=rank)],
+        })
+
+    return {
+        "counts": {
+            "failed_suppliers": len(set(failed_ids)),
+            "parts_without_supplier": int(unsupplied.sum()),
+            "parts_lost": int(lost.sum()),
+            "products_lost": int(products_lost.sum()),
+            "single_source_critical": int(single_source.sum()),
+        },
+        "lost_parts": [part_row(p) for p in lost_ids[:limit]],
+        "impacted_products": products,
+        "single_source_critical": [
+            {
+                "uri": graph.part_uris[p],
+                "label": graph.part_labels[p],
+                "supplier": graph.supplier_labels[int(graph.suppliers_of(p)[0])],
+            }
+            for p in single_ids[:limit]
+        ],
+        "truncated": max(len(lost_ids), len(product_ids), len(single_ids)) > limit,
+    }
+
+
+def scenario_analysis(
+    suppliers: List[str],
+    sparql_endpoint: Optional[str],
+    limit: int = 1000,
+) -> Dict[str, Any]:
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+
+    graph = get_supply_graph(sparql_endpoint)
+    index = get_supplier_index(sparql_endpoint)
+
+    failed_ids: List[int] = []
+    resolved, unresolved = [], []
+    with stage("scenario_resolve"):
+        for name in suppliers:
+            # Accept KG URIs as-is, otherwise resolve labels like /impact does
+            match = index.resolve(name) if name not in graph.supplier_id else {"uri": name}
+            i = graph.supplier_id.get(match["uri"]) if match else None
+            if i is None:
+                unresolved.append(name)
+                continue
+            failed_ids.append(i)
+            resolved.append({"name": name, "uri": graph.supplier_uris[i], "label": graph.supplier_labels[i]})
+
+    if not failed_ids:
+        raise LookupError(f"No supplier found for: {', '.join(unresolved)}")
+
+    with stage("scenario_evaluate"):
+        result = evaluate_scenario(graph, failed_ids, limit=limit)
+
+    return {"failed_suppliers": resolved, "unresolved": unresolved, **result}
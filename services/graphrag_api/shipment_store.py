@@ -0,0 +1,373 @@
+import csv
+import os
+import threading
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from kg import ARTIFACT_DIR, SCR_NS, VersionedCache
+from metrics import stage
+from supplier_index import get_supplier_index
+
+
+ARTIFACT_NAME = "shipments.npz"
+
+# API path segment -> (column, KG class)
+DIMENSIONS = {"suppliers": ("supplier", "Supplier"), "parts": ("part", "Part"), "facilities": ("facility", "Facility")}
+_KEY_COLUMNS = {"supplier": "supplier_key", "part": "part_key", "facility": "facility_key"}
+
+# Appended rows are merged into the sorted block once the delta grows past this
+DELTA_MAX = int(os.environ.get("SHIPMENT_DELTA_MAX", "50000"))
+
+# Posted shipments are appended here, next to the raw CSVs the DAG loads: the
+# file's hash change triggers the load, dbt unions it into f_shipment, and the
+# next export contains the rows.
+SHIPMENT_LOG = os.environ.get("SHIPMENT_LOG", "/opt/project/data/raw/shipments_posted.csv")
+# Raw CSV columns (shipments.csv) -> mart columns
+_LOG_COLUMNS = {
+    "shipment_id": "shipment_id", "ship_date": "ship_date", "supplier_id": "supplier_key",
+    "part_id": "part_key", "facility_id": "facility_key", "qty": "qty",
+    "lead_time_days": "lead_time_days", "status": "status",
+}
+
+_VALUES = ("day", "qty", "lead_time_days", "on_time")
+_DTYPES = {
+    "day": np.int32, "qty": np.int64, "lead_time_days": np.float32, "on_time": bool,
+    "supplier": np.int32, "part": np.int32, "facility": np.int32,
+}
+
+
+def _day(d: Any) -> int:
+    return int(np.datetime64(d, "D").astype(np.int64))
+
+
+def _iso(day: int) -> str:
+    return str(np.datetime64(int(day), "D"))
+
+
+def _empty() -> Dict[str, np.ndarray]:
+    return {c: np.zeros(0, dtype=t) for c, t in _DTYPES.items()}
+
+
+class _Block:
+    """Columns sorted by day, plus one (permutation, offsets) index per dimension.
+
+    The permutation is a stable argsort by key code, so each key's rows are one
+    contiguous, still date-sorted run: a window is two searchsorted calls.
+    """
+
+    def __init__(self, cols: Dict[str, np.ndarray], n_keys: Dict[str, int]):
+        order = np.argsort(cols["day"], kind="stable")
+        self.cols = {c: v[order] for c, v in cols.items()}
+        self.index = {}
+        for dim, n in n_keys.items():
+            perm = np.argsort(self.cols[dim], kind="stable")
+            offsets = np.searchsorted(self.cols[dim][perm], np.arange(n + 1))
+            self.index[dim] = (perm, offsets)
+
+    def __len__(self) -> int:
+        return len(self.cols["day"])
+
+    def rows(self, dim: str, code: int) -> np.ndarray:
+        perm, offsets = self.index[dim]
+        if code + 1 >= len(offsets):
+            return perm[:0]
+        return perm[offsets[code]:offsets[code + 1]]
+
+
+class ShipmentStore:
+    """Columnar, date-sorted shipments from the marts, plus an append-only delta.
+
+    Queries combine the key's run in the sorted block with a masked scan of
+    the (small) delta; the delta is folded into the block every DELTA_MAX rows.
+    """
+
+    def __init__(
+        self,
+        cols: Dict[str, np.ndarray],
+        keys: Dict[str, List[str]],
+        shipment_ids: Iterable[str] = (),
+        build_id: Optional[str] = None,
+    ):
+        self.build_id = build_id
+        self._lock = threading.Lock()
+        self._keys = {dim: list(keys.get(dim, [])) for dim in _KEY_COLUMNS}
+        self._codes = {dim: {k: i for i, k in enumerate(v)} for dim, v in self._keys.items()}
+        self._ids = set(shipment_ids)
+        self._block = _Block({c: cols[c].astype(t, copy=False) for c, t in _DTYPES.items()}, self._n_keys())
+        self._delta = _empty()
+        # Bytes of SHIPMENT_LOG already replayed into this store
+        self.log_offset = 0
+
+    @classmethod
+    def from_artifact(cls, path: str) -> "ShipmentStore":
+        if not os.path.exists(path):
+            return cls(_empty(), {})
+        with np.load(path) as z:
+            return cls(
+                cols={c: z[c] for c in _DTYPES},
+                keys={dim: z[f"{dim}_keys"].tolist() for dim in _KEY_COLUMNS},
+                shipment_ids=z["shipment_id"].tolist(),
+                build_id=str(z["build_id"]),
+            )
+
+    def _n_keys(self) -> Dict[str, int]:
+        return {dim: len(v) for dim, v in self._keys.items()}
+
+    def __len__(self) -> int:
+        return len(self._block) + len(self._delta["day"])
+
+    def __contains__(self, shipment_id: str) -> bool:
+        return str(shipment_id) in self._ids
+
+    def code(self, dim: str, key: str) -> Optional[int]:
+        return self._codes[dim].get(key)
+
+    def append(self, shipments: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """Add new shipments (mart column names); ids already present are skipped."""
+        new: Dict[str, List[Any]] = {c: [] for c in _DTYPES}
+        dup = 0
+        with self._lock:
+            for s in shipments:
+                sid = str(s["shipment_id"])
+                if sid in self._ids:
+                    dup += 1
+                    continue
+                self._ids.add(sid)
+                new["day"].append(_day(s["ship_date"]))
+                new["qty"].append(int(s.get("qty") or 0))
+                lead = s.get("lead_time_days")
+                new["lead_time_days"].append(np.nan if lead is None else float(lead))
+                new["on_time"].append(str(s.get("status") or "").upper() == "ON_TIME")
+                for dim, column in _KEY_COLUMNS.items():
+                    key = str(s[column])
+                    code = self._codes[dim].get(key)
+                    if code is None:
+                        code = self._codes[dim][key] = len(self._keys[dim])
+                        self._keys[dim].append(key)
+                    new[dim].append(code)
+
+            if new["day"]:
+                self._delta = {
+                    c: np.concatenate([self._delta[c], np.asarray(new[c], dtype=t)])
+                    for c, t in _DTYPES.items()
+                }
+                if len(self._delta["day"]) >= DELTA_MAX:
+                    self._compact()
+        return {"added": len(new["day"]), "duplicates": dup, "total": len(self)}
+
+    def _compact(self) -> None:
+        cols = {c: np.concatenate([self._block.cols[c], self._delta[c]]) for c in _DTYPES}
+        self._block = _Block(cols, self._n_keys())
+        self._delta = _empty()
+
+    def _key_rows(self, dim: str, code: int) -> Dict[str, np.ndarray]:
+        # Snapshot under the lock; arrays are never mutated in place afterwards
+        with self._lock:
+            block, delta = self._block, self._delta
+        idx = block.rows(dim, code)
+        out = {c: block.cols[c][idx] for c in _VALUES}
+        mask = delta[dim] == code
+        if mask.any():
+            out = {c: np.concatenate([out[c], delta[c][mask]]) for c in _VALUES}
+            order = np.argsort(out["day"], kind="stable")
+            out = {c: v[order] for c, v in out.items()}
+        return out
+
+    def last_day(self) -> Optional[int]:
+        with self._lock:
+            block, delta = self._block.cols["day"], self._delta["day"]
+        days = ([int(block[-1])] if len(block) else []) + ([int(delta.max())] if len(delta) else [])
+        return max(days) if days else None
+
+    def performance(
+        self,
+        dim: str,
+        code: int,
+        window_days: int = 90,
+        as_of: Optional[int] = None,
+        points: int = 0,
+        step_days: int = 7,
+    ) -> Dict[str, Any]:
+        """Window stats ending at `as_of` plus an optional rolling series.
+
+        The series re-evaluates the same trailing window at `points` end dates,
+        `step_days` apart, from prefix sums: O(points * log n) after the scan.
+        """
+        if as_of is None:
+            as_of = self.last_day() or 0
+        r = self._key_rows(dim, code)
+        day = r["day"]
+
+        lo, hi = np.searchsorted(day, [as_of - window_days + 1, as_of + 1])
+        lead = r["lead_time_days"][lo:hi]
+        lead = lead[~np.isnan(lead)]
+        n = int(hi - lo)
+        summary = {
+            "window": {"start": _iso(as_of - window_days + 1), "end": _iso(as_of), "days": window_days},
+            "shipments": n,
+            "on_time_rate": round(float(r["on_time"][lo:hi].mean()), 4) if n else None,
+            "volume": int(r["qty"][lo:hi].sum()),
+            "lead_time_days": {
+                q: round(float(v), 2) for q, v in zip(("p50", "p90", "p95"), np.percentile(lead, [50, 90, 95]))
+            } if len(lead) else None,
+        }
+
+        if points > 0:
+            ends = as_of - step_days * np.arange(points - 1, -1, -1)
+            starts = np.searchsorted(day, ends - window_days + 1)
+            stops = np.searchsorted(day, ends + 1)
+            on_time = np.concatenate([[0], np.cumsum(r["on_time"], dtype=np.int64)])
+            qty = np.concatenate([[0], np.cumsum(r["qty"], dtype=np.int64)])
+            counts = stops - starts
+            ok = on_time[stops] - on_time[starts]
+            vol = qty[stops] - qty[starts]
+            summary["series"] = [
+                {
+                    "end": _iso(e),
+                    "shipments": int(c),
+                    "on_time_rate": round(float(o) / c, 4) if c else None,
+                    "volume": int(v),
+                }
+                for e, c, o, v in zip(ends.tolist(), counts.tolist(), ok.tolist(), vol.tolist())
+            ]
+        return summary
+
+
+# Serializes log appends and replays
+_LOG_LOCK = threading.Lock()
+
+
+def _read_log(path: str, offset: int) -> Tuple[List[Dict[str, Any]], int]:
+    """Rows of complete lines after byte `offset`, and the offset after them."""
+    if not os.path.exists(path) or os.path.getsize(path) <= offset:
+        return [], offset
+    with open(path, "rb") as f:
+        f.seek(offset)
+        data = f.read()
+    # A line still being written (or torn by a crash) is left for later
+    data = data[:data.rfind(b"\n") + 1]
+    lines = data.decode("utf-8").splitlines()
+    if offset == 0 and lines:
+        lines = lines[1:]
+    rows = [
+        {m: (v or None) for m, v in zip(_LOG_COLUMNS.values(), r)}
+        for r in csv.reader(lines)
+        if len(r) == len(_LOG_COLUMNS)
+    ]
+    return rows, offset + len(data)
+
+
+def _append_log(path: str, shipments: List[Dict[str, Any]]) -> None:
+    if not shipments:
+        return
+    size = os.path.getsize(path) if os.path.exists(path) else 0
+    torn = False
+    if size:
+        with open(path, "rb") as f:
+            f.seek(-1, os.SEEK_END)
+            torn = f.read(1) != b"\n"
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        if torn:
+            f.write("\n")
+        w = csv.writer(f, lineterminator="\n")
+        if not size:
+            w.writerow(_LOG_COLUMNS)
+        w.writerows([["" if s.get(m) is None else s[m] for m in _LOG_COLUMNS.values()] for s in shipments])
+        f.flush()
+        os.fsync(f.fileno())
+
+
+def _catch_up(store: ShipmentStore) -> Dict[str, int]:
+    # Every store catches up with the log on its own, so rows logged while a
+    # reload was building its replacement still reach the new store.
+    # Called with _LOG_LOCK held; ids already in the store are skipped.
+    rows, store.log_offset = _read_log(SHIPMENT_LOG, store.log_offset)
+    return store.append(rows)
+
+
+def _replay_log(store: ShipmentStore) -> None:
+    with _LOG_LOCK:
+        _catch_up(store)
+
+
+def load_shipment_store(endpoint: str) -> ShipmentStore:
+    # Reloaded with the KG build; posted shipments the export does not
+    # contain yet are replayed from the log (also after a restart).
+    with stage("shipment_store_load"):
+        store = ShipmentStore.from_artifact(os.path.join(ARTIFACT_DIR, ARTIFACT_NAME))
+        _replay_log(store)
+        return store
+
+
+_CACHE: VersionedCache[ShipmentStore] = VersionedCache(
+    load_shipment_store,
+    check_interval_s=float(os.environ.get("SHIPMENT_STORE_REFRESH_S", "60")),
+)
+
+
+def get_shipment_store(endpoint: str) -> ShipmentStore:
+    store = _CACHE.get(endpoint)
+    _replay_log(store)
+    return store
+
+
+def ingest_shipments(shipments: List[Dict[str, Any]], sparql_endpoint: Optional[str]) -> Dict[str, int]:
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+    store = get_shipment_store(sparql_endpoint)
+    with _LOG_LOCK:
+        _catch_up(store)
+        fresh, seen = [], set()
+        for s in shipments:
+            sid = str(s["shipment_id"])
+            if sid not in seen and sid not in store:
+                seen.add(sid)
+                fresh.append(s)
+        with stage("shipment_append"):
+            # Durable first: a row that fails to reach the log is not served either
+            _append_log(SHIPMENT_LOG, fresh)
+            res = _catch_up(store)
+    res["duplicates"] = len(shipments) - len(fresh)
+    return res
+
+
+def shipment_performance(
+    dimension: str,
+    key: str,
+    sparql_endpoint: Optional[str],
+    window_days: int = 90,
+    as_of: Optional[date] = None,
+    points: int = 0,
+    step_days: int = 7,
+) -> Dict[str, Any]:
+    """On-time rate, lead-time percentiles and volume for one supplier, part or facility.
+
+    `key` is the warehouse key or KG URI; suppliers may also be given by name.
+    """
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+    dim, cls = DIMENSIONS[dimension]
+    store = get_shipment_store(sparql_endpoint)
+
+    k = key.rsplit("/", 1)[-1]
+    code = store.code(dim, k)
+    if code is None and dim == "supplier":
+        match = get_supplier_index(sparql_endpoint).resolve(key)
+        if match:
+            k = match["uri"].rsplit("/", 1)[-1]
+            code = store.code(dim, k)
+    if code is None:
+        raise LookupError(f"No shipments for {dim} {key}")
+
+    with stage("shipment_scan"):
+        stats = store.performance(
+            dim,
+            code,
+            window_days=window_days,
+            as_of=_day(as_of) if as_of else None,
+            points=points,
+            step_days=step_days,
+        )
+    return {"uri": f"{SCR_NS}{cls}/{k}", "key": k, "build_id": store.build_id, **stats}
@@ -0,0 +1,443 @@
+import argparse
+import json
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from kg import PREFIXES, VersionedCache, sparql_select
+from metrics import stage
+from supply_graph import GroupedEdges, SupplyGraph, get_supply_graph, load_supply_graph
+
+
+# Suppliers with no recorded disruption borrow this many days of the fleet-wide
+# rate, so a short history does not translate into "never fails".
+PRIOR_DAYS = 365.0
+# Keep the per-chunk (runs x parts) float32 matrices around ~100 MB.
+_CELLS_PER_CHUNK = 25_000_000
+
+
+class RiskModel:
+    """Everything a simulation worker needs, aligned to SupplyGraph ids.
+
+    Severity and duration histories are stored as one flat pool per quantity;
+    each supplier points at its own slice (`*_off`, `*_len`) or, without
+    history, at the fleet-wide slice at the end of the pool.
+    """
+
+    def __init__(
+        self,
+        graph: SupplyGraph,
+        disruptions: List[Tuple[str, Optional[str], Optional[str], Optional[float]]],
+        lead_times: Dict[str, float],
+        part_regions: List[Tuple[str, str, Optional[str]]],
+        window_days: float,
+    ):
+        self.graph = graph
+        n = graph.n_suppliers
+        self.window_days = max(window_days, 365.0)
+
+        sev: List[List[float]] = [[] for _ in range(n)]
+        dur: List[List[float]] = [[] for _ in range(n)]
+        for s_uri, start, end, severity in disruptions:
+            i = graph.supplier_id.get(s_uri)
+            if i is None:
+                continue
+            sev[i].append(1.0 if severity is None else min(max(severity, 0.0), 1.0))
+            if start and end:
+                dur[i].append(max((date.fromisoformat(end) - date.fromisoformat(start)).days + 1, 1))
+
+        events = np.array([len(x) for x in sev], dtype=np.float64)
+        fleet_rate = events.sum() / max(n, 1) / self.window_days
+        self.rate_per_day = (events + PRIOR_DAYS * fleet_rate) / (self.window_days + PRIOR_DAYS)
+
+        self.sev_pool, self.sev_off, self.sev_len = self._pool(sev, default=1.0)
+        self.dur_pool, self.dur_off, self.dur_len = self._pool(dur, default=1.0)
+
+        leads = np.full(n, np.nan)
+        for s_uri, lt in lead_times.items():
+            i = graph.supplier_id.get(s_uri)
+            if i is not None:
+                leads[i] = lt
+        fleet_lead = np.nanmean(leads) if np.isfinite(leads).any() else 0.0
+        self.lead_days = np.where(np.isfinite(leads), leads, fleet_lead)
+
+        self.region_uris: List[str] = []
+        self.region_labels: List[str] = []
+        region_id: Dict[str, int] = {}
+        src, dst = [], []
+        for part_uri, region_uri, region_label in part_regions:
+            p = graph.part_id.get(part_uri)
+            if p is None:
+                continue
+            if region_uri not in region_id:
+                region_id[region_uri] = len(self.region_uris)
+                self.region_uris.append(region_uri)
+                self.region_labels.append(region_label or region_uri.split("/")[-1])
+            src.append(p)
+            dst.append(region_id[region_uri])
+        self.part_region = GroupedEdges(np.array(src, dtype=np.int64), np.array(dst, dtype=np.int64))
+
+    @staticmethod
+    def _pool(per_supplier: List[List[float]], default: float):
+        fleet = [v for xs in per_supplier for v in xs] or [default]
+        flat, off, length = [], [], []
+        fleet_off = sum(len(xs) for xs in per_supplier)
+        for xs in per_supplier:
+            if xs:
+                off.append(len(flat))
+                length.append(len(xs))
+                flat.extend(xs)
+            else:
+                off.append(fleet_off)
+                length.append(len(fleet))
+        flat.extend(fleet)
+        return (
+            np.array(flat, dtype=np.float32),
+            np.array(off, dtype=np.int64),
+            np.array(length, dtype=np.int64),
+        )
+
+    @property
+    def n_regions(self) -> int:
+        return len(self.region_uris)
+
+    def chunk_size(self) -> int:
+        width = max(self.graph.n_parts, self.graph.n_suppliers, len(self.graph.supply), 1)
+        return int(max(1, min(2000, _CELLS_PER_CHUNK // width)))
+
+
+def _sample_pool(rng, pool, off, length, shape) -> np.ndarray:
+    idx = off + (rng.random(shape) * length).astype(np.int64)
+    return pool[idx]
+
+
+def simulate_chunk(
+    model: RiskModel, runs: int, horizon_days: float, seed: np.random.SeedSequence
+) -> Dict[str, np.ndarray]:
+    """Sample `runs` disruption scenarios at once and return per-node sums.
+
+    Each supplier is hit within the horizon with probability 1 - exp(-rate * H).
+    A hit becomes an outage with probability equal to a severity drawn from the
+    supplier's history; the outage starts uniformly in the horizon and lasts a
+    historical duration plus the supplier's mean lead time (resupply).
+    A part is down while all its suppliers are down at the same time
+    (intersection of their windows); parents, products and regions take the
+    longest downtime of anything beneath them.
+    """
+    g = model.graph
+    horizon = float(horizon_days)
+    rng = np.random.default_rng(seed)
+    shape = (runs, g.n_suppliers)
+
+    p_hit = 1.0 - np.exp(-model.rate_per_day * horizon)
+    hit = rng.random(shape) < p_hit
+    severity = _sample_pool(rng, model.sev_pool, model.sev_off, model.sev_len, shape)
+    outage = hit & (rng.random(shape) < severity)
+
+    duration = _sample_pool(rng, model.dur_pool, model.dur_off, model.dur_len, shape) + model.lead_days
+    start = (rng.random(shape) * horizon).astype(np.float32)
+    end = np.minimum(start + duration, horizon).astype(np.float32)
+    start = np.where(outage, start, np.float32(np.inf))
+    end = np.where(outage, end, np.float32(-np.inf))
+
+    part_down = np.zeros((runs, g.n_parts), dtype=np.float32)
+    overlap = g.supply.reduce(np.minimum, end) - g.supply.reduce(np.maximum, start)
+    part_down[:, g.supply.targets] = np.maximum(overlap, 0.0)
+    part_down = g.propagate_up(part_down, np.maximum)
+
+    product_down = g.products_of(part_down, np.maximum)
+    region_down = np.zeros((runs, model.n_regions), dtype=np.float32)
+    region_down[:, model.part_region.targets] = model.part_region.reduce(np.maximum, part_down)
+
+    return {
+        "supplier_outages": outage.sum(axis=0),
+        "product_loss": (product_down > 0).sum(axis=0),
+        "product_down_days": product_down.sum(axis=0, dtype=np.float64),
+        "region_loss": (region_down > 0).sum(axis=0),
+        "region_down_days": region_down.sum(axis=0, dtype=np.float64),
+    }
+
+
+_WORKER_MODEL: Optional[RiskModel] = None
+
+
+def _init_worker(model: RiskModel) -> None:
+    global _WORKER_MODEL
+    _WORKER_MODEL = model
+
+
+def _worker_chunk(runs: int, horizon_days: float, seed: np.random.SeedSequence) -> Dict[str, np.ndarray]:
+    return simulate_chunk(_WORKER_MODEL, runs, horizon_days, seed)
+
+
+def max_workers() -> int:
+    return max(1, int(os.environ.get("SIM_WORKERS", str(os.cpu_count() or 1))))
+
+
+# One process pool per RiskModel: workers receive the model once, at start-up,
+# and are reused by every request until the model is reloaded.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_MODEL: Optional[RiskModel] = None
+_POOL_LOCK = threading.Lock()
+
+
+def _pool_for(model: RiskModel) -> ProcessPoolExecutor:
+    # Caller holds _POOL_LOCK
+    global _POOL, _POOL_MODEL
+    if _POOL is None or _POOL_MODEL is not model:
+        if _POOL is not None:
+            # Chunks already queued on the old pool still finish
+            _POOL.shutdown(wait=False)
+        # spawn, not fork: the API process has live threads (uvicorn pool, torch)
+        _POOL = ProcessPoolExecutor(
+            max_workers=max_workers(),
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(model,),
+        )
+        _POOL_MODEL = model
+    return _POOL
+
+
+def _run_pooled(model, sizes, horizon_days, seeds) -> List[Dict[str, np.ndarray]]:
+    global _POOL
+    # All chunks are queued at once, under the lock, so a model reload (which
+    # retires the pool) cannot cut a request off half-way.
+    with _POOL_LOCK:
+        pool = _pool_for(model)
+        futures = [pool.submit(_worker_chunk, n, horizon_days, s) for n, s in zip(sizes, seeds)]
+    try:
+        return [f.result() for f in futures]
+    except BrokenProcessPool:
+        # A worker died (e.g. OOM-killed); start a fresh pool next time
+        with _POOL_LOCK:
+            if _POOL is pool:
+                _POOL = None
+        raise
+
+
+def run_simulation(
+    model: RiskModel,
+    runs: int,
+    horizon_days: float,
+    seed: Optional[int] = None,
+    workers: int = 1,
+    top_k: int = 20,
+) -> Dict[str, Any]:
+    chunk = model.chunk_size()
+    sizes = [min(chunk, runs - i) for i in range(0, runs, chunk)]
+    # One child seed per chunk: results depend on `seed`, not on the worker count.
+    root = np.random.SeedSequence(seed)
+    seeds = root.spawn(len(sizes))
+
+    # workers > 1 uses the shared pool, which never has more than max_workers() processes
+    if min(workers, max_workers(), len(sizes)) > 1:
+        parts = _run_pooled(model, sizes, horizon_days, seeds)
+    else:
+        parts = [simulate_chunk(model, n, horizon_days, s) for n, s in zip(sizes, seeds)]
+
+    totals = {k: sum(p[k] for p in parts) for k in parts[0]} if parts else {}
+    g = model.graph
+
+    def ranked(uris, labels, loss, down):
+        rows = [
+            {
+                "uri": uris[i],
+                "label": labels[i],
+                "p_supply_loss": round(float(loss[i]) / runs, 6),
+                "expected_downtime_days": round(float(down[i]) / runs, 4),
+            }
+            for i in range(len(uris))
+        ]
+        rows.sort(key=lambda r: (-r["p_supply_loss"], -r["expected_downtime_days"], r["label"]))
+        return rows[:top_k]
+
+    return {
+        "runs": runs,
+        "horizon_days": horizon_days,
+        "seed": root.entropy,
+        "products": ranked(g.product_uris, g.product_labels, totals["product_loss"], totals["product_down_days"]),
+        "regions": ranked(model.region_uris, model.region_labels, totals["region_loss"], totals["region_down_days"]),
+        "suppliers_most_disrupted": sorted(
+            (
+                {"uri": g.supplier_uris[i], "label": g.supplier_labels[i],
+                 "p_outage": round(float(totals["supplier_outages"][i]) / runs, 6)}
+                for i in range(g.n_suppliers)
+            ),
+            key=lambda r: (-r["p_outage"], r["label"]),
+        )[:top_k],
+    }
+
+
+def _dates(rows, *keys) -> List[date]:
+    out = []
+    for r in rows:
+        for k in keys:
+            v = r.get(k, {}).get("value")
+            if v:
+                out.append(date.fromisoformat(v[:10]))
+    return out
+
+
+def load_risk_model(endpoint: str, graph: Optional[SupplyGraph] = None) -> RiskModel:
+    graph = graph or get_supply_graph(endpoint)
+    with stage("risk_model_load"):
+        disr = sparql_select(endpoint, PREFIXES + """
+SELECT ?s ?start ?end ?sev WHERE {
+  ?s scr:hasDisruption ?d .
+  OPTIONAL { ?d scr:startDate ?start }
+  OPTIONAL { ?d scr:endDate ?end }
+  OPTIONAL { ?d scr:severity ?sev }
+}
+""", timeout_s=300)
+        ships = sparql_select(endpoint, PREFIXES + """
+SELECT ?s (AVG(?lt) AS ?lead) (MIN(?dt) AS ?first) (MAX(?dt) AS ?last) WHERE {
+  ?sh scr:fromSupplier ?s ;
+      scr:leadTimeDays ?lt ;
+      scr:shipDate ?dt .
+} GROUP BY ?s
+""", timeout_s=300)
+        regions = sparql_select(endpoint, PREFIXES + """
+SELECT DISTINCT ?part ?region ?regionLabel WHERE {
+  ?sh scr:forPart ?part ;
+      scr:toFacility ?facility .
+  ?facility scr:locatedIn ?region .
+  OPTIONAL { ?region rdfs:label ?regionLabel }
+}
+""", timeout_s=300)
+
+    seen = _dates(disr, "start", "end") + _dates(ships, "first", "last")
+    window_days = float((max(seen) - min(seen)).days + 1) if seen else 365.0
+
+    def val(r, k):
+        return r.get(k, {}).get("value")
+
+    return RiskModel(
+        graph=graph,
+        disruptions=[
+            (val(r, "s"), val(r, "start"), val(r, "end"), float(val(r, "sev")) if val(r, "sev") else None)
+            for r in disr
+        ],
+        lead_times={val(r, "s"): float(val(r, "lead")) for r in ships if val(r, "lead")},
+        part_regions=[(val(r, "part"), val(r, "region"), val(r, "regionLabel")) for r in regions],
+        window_days=window_days,
+    )
+
+
+_CACHE: VersionedCache[RiskModel] = VersionedCache(
+    load_risk_model,
+    check_interval_s=float(os.environ.get("SUPPLY_GRAPH_REFRESH_S", "60")),
+)
+
+
+def simulate_risk(
+    sparql_endpoint: Optional[str],
+    runs: int,
+    horizon_days: float,
+    seed: Optional[int] = None,
+    workers: Optional[int] = None,
+    top_k: int = 20,
+) -> Dict[str, Any]:
+    if not sparql_endpoint:
+        raise RuntimeError("SPARQL_ENDPOINT env var not set")
+    model = _CACHE.get(sparql_endpoint)
+    with stage("simulation"):
+        return run_simulation(
+            model,
+            runs=runs,
+            horizon_days=horizon_days,
+            seed=seed,
+            workers=workers or max_workers(),
+            top_k=top_k,
+        )
+
+
+# Requests with more runs than this are queued as jobs instead of blocking.
+SYNC_MAX_RUNS = int(os.environ.get("SIM_SYNC_MAX_RUNS", "2000"))
+# Jobs kept for polling (queued, running and finished); finished ones are dropped oldest first.
+MAX_JOBS = int(os.environ.get("SIM_MAX_JOBS", "100"))
+
+
+class SimulationQueueFull(RuntimeError):
+    pass
+
+
+# Jobs run one at a time; each already spreads its chunks over the process pool.
+_JOB_RUNNER = ThreadPoolExecutor(max_workers=1, thread_name_prefix="simulation")
+_JOBS: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+_JOBS_LOCK = threading.Lock()
+
+
+def _run_job(job_id: str, kwargs: Dict[str, Any]) -> None:
+    with _JOBS_LOCK:
+        _JOBS[job_id]["status"] = "running"
+    try:
+        result, error = simulate_risk(**kwargs), None
+    except Exception as e:
+        result, error = None, str(e)
+    with _JOBS_LOCK:
+        _JOBS[job_id].update(
+            status="failed" if error else "done",
+            finished_at=time.time(),
+            result=result,
+            error=error,
+        )
+
+
+def submit_simulation(**kwargs: Any) -> Dict[str, Any]:
+    """Queue a simulate_risk call; poll it with simulation_job(job_id)."""
+    job_id = uuid.uuid4().hex
+    with _JOBS_LOCK:
+        finished = [k for k, j in _JOBS.items() if j["status"] in ("done", "failed")]
+        active = len(_JOBS) - len(finished)
+        if active >= MAX_JOBS:
+            raise SimulationQueueFull(f"{active} simulation jobs pending, try again later")
+        for k in finished[:max(0, len(_JOBS) + 1 - MAX_JOBS)]:
+            del _JOBS[k]
+        _JOBS[job_id] = {"job_id": job_id, "status": "queued", "submitted_at": time.time()}
+        job = dict(_JOBS[job_id])
+    _JOB_RUNNER.submit(_run_job, job_id, kwargs)
+    return job
+
+
+def simulation_job(job_id: str) -> Dict[str, Any]:
+    with _JOBS_LOCK:
+        job = _JOBS.get(job_id)
+        if job is None:
+            raise LookupError(f"Unknown simulation job: {job_id}")
+        return dict(job)
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Monte Carlo supply-loss simulation over the KG")
+    ap.add_argument("--sparql-endpoint", default=os.environ.get("SPARQL_ENDPOINT", "http://localhost:3030/sc/sparql"))
+    ap.add_argument("--runs", type=int, default=10000)
+    ap.add_argument("--horizon-days", type=float, default=90.0)
+    ap.add_argument("--seed", type=int, default=None)
+    ap.add_argument("--workers", type=int, default=max_workers())
+    ap.add_argument("--top-k", type=int, default=20)
+    args = ap.parse_args()
+
+    model = load_risk_model(args.sparql_endpoint, load_supply_graph(args.sparql_endpoint))
+    out = run_simulation(
+        model,
+        runs=args.runs,
+        horizon_days=args.horizon_days,
+        seed=args.seed,
+        workers=args.workers,
+        top_k=args.top_k,
+    )
+    print(json.dumps(out, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
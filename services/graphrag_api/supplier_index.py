@@ -0,0 +1,275 @@
+import bisect
+import os
+import re
+import unicodedata
+from collections import Counter
+from functools import lru_cache
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from kg import PREFIXES, VersionedCache, sparql_select
+from metrics import stage
+
+
+# Fuzzy matching works per token: each distinct name token indexes the
+# bigrams of its first PREFIX_LEN characters. A query maps each of its tokens
+# to similar vocabulary tokens (bigram count filter, then a bounded edit
+# distance), intersects their postings and verifies at most MAX_CANDIDATES
+# whole names.
+MAX_EDITS = 2
+PREFIX_LEN = 7
+MAX_CANDIDATES = int(os.environ.get("SUPPLIER_FUZZY_MAX_CANDIDATES", "500"))
+SIMILAR_CACHE_SIZE = 4096
+# Autocomplete runs on every keystroke: its fuzzy fallback allows one edit,
+# checks fewer candidates and needs a query of at least SEARCH_FUZZY_MIN_LEN
+SEARCH_FUZZY_EDITS = 1
+SEARCH_FUZZY_CANDIDATES = 100
+SEARCH_FUZZY_MIN_LEN = 4
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(name: str) -> str:
+    # "Île-de-France  GmbH" -> "ile de france gmbh"
+    s = unicodedata.normalize("NFKD", name)
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return _NON_ALNUM.sub(" ", s.casefold()).strip()
+
+
+def _grams(word: str) -> List[str]:
+    padded = f" {word} "
+    return [padded[i:i + 2] for i in range(len(padded) - 1)]
+
+
+def bounded_levenshtein(a: str, b: str, max_dist: int) -> Optional[int]:
+    """Edit distance between a and b, or None if it exceeds max_dist.
+
+    Only the diagonal band |i - j| <= max_dist is filled; cells outside it
+    are over the bound anyway.
+    """
+    if abs(len(a) - len(b)) > max_dist:
+        return None
+    if len(a) > len(b):
+        a, b = b, a
+    over = max_dist + 1
+    prev = [i if i <= max_dist else over for i in range(len(a) + 1)]
+    for j, cb in enumerate(b, 1):
+        lo, hi = max(1, j - max_dist), min(len(a), j + max_dist)
+        cur = [over] * (len(a) + 1)
+        cur[0] = j if j <= max_dist else over
+        row_min = cur[0]
+        for i in range(lo, hi + 1):
+            v = min(prev[i] + 1, cur[i - 1] + 1, prev[i - 1] + (a[i - 1] != cb))
+            cur[i] = v if v < over else over
+            if v < row_min:
+                row_min = v
+        if row_min > max_dist:
+            return None
+        prev = cur
+    return prev[-1] if prev[-1] <= max_dist else None
+
+
+def _token_edits(token: str) -> int:
+    # Two edits on a short token match half the vocabulary
+    return 1 if len(token) <= 5 else 2
+
+
+class SupplierIndex:
+    """In-memory supplier label index: exact, prefix and fuzzy lookup.
+
+    Entries are (uri, label). Lookups work on normalized labels, so case,
+    accents and punctuation never cause a miss.
+    """
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]):
+        self.entries: List[Tuple[str, str]] = []
+        self._norm: List[str] = []
+        self._exact: Dict[str, List[int]] = {}
+        # token text -> token id, token id -> entries containing it
+        self._vocab: Dict[str, int] = {}
+        self._tokens: List[str] = []
+        self._postings: List[List[int]] = []
+        self._grams: Dict[str, List[int]] = {}
+
+        prefix_keys: List[Tuple[str, int]] = []
+        for uri, label in entries:
+            norm = normalize(label)
+            if not norm:
+                continue
+            idx = len(self.entries)
+            self.entries.append((uri, label))
+            self._norm.append(norm)
+            self._exact.setdefault(norm, []).append(idx)
+
+            # Prefix keys start at every word so "comp" finds "Astra Components".
+            prefix_keys.append((norm, idx))
+            for m in re.finditer(r" ", norm):
+                prefix_keys.append((norm[m.end():], idx))
+
+            ids = set()
+            for w in norm.split():
+                t = self._vocab.get(w)
+                if t is None:
+                    t = self._vocab[w] = len(self._tokens)
+                    self._tokens.append(w)
+                    self._postings.append([])
+                    for g in set(_grams(w[:PREFIX_LEN])):
+                        self._grams.setdefault(g, []).append(t)
+                if t not in ids:
+                    ids.add(t)
+                    self._postings[t].append(idx)
+
+        # Common words ("gmbh", "components") recur across queries
+        self._similar = lru_cache(maxsize=SIMILAR_CACHE_SIZE)(self._similar_tokens)
+
+        prefix_keys.sort()
+        self._prefix_keys = [k for k, _ in prefix_keys]
+        self._prefix_ids = [i for _, i in prefix_keys]
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def _hit(self, idx: int, match: str, distance: int = 0) -> Dict[str, object]:
+        uri, label = self.entries[idx]
+        return {"uri": uri, "label": label, "match": match, "distance": distance}
+
+    def exact(self, name: str) -> List[Dict[str, object]]:
+        return [self._hit(i, "exact") for i in self._exact.get(normalize(name), [])]
+
+    def prefix(self, q: str, limit: int = 10) -> List[Dict[str, object]]:
+        norm = normalize(q)
+        if not norm:
+            return []
+        out: List[Dict[str, object]] = []
+        seen: Set[int] = set()
+        pos = bisect.bisect_left(self._prefix_keys, norm)
+        while pos < len(self._prefix_keys) and len(out) < limit:
+            if not self._prefix_keys[pos].startswith(norm):
+                break
+            idx = self._prefix_ids[pos]
+            if idx not in seen:
+                seen.add(idx)
+                out.append(self._hit(idx, "prefix"))
+            pos += 1
+        return out
+
+    def _similar_tokens(self, token: str, max_edits: int) -> Set[int]:
+        """Vocabulary tokens whose indexed prefix is within max_edits of token's.
+
+        Comparing prefixes only keeps a query token that swallowed the next
+        word ("astracomponents") matched to its first word; whole names are
+        verified afterwards anyway.
+        """
+        head = token[:PREFIX_LEN]
+        grams = set(_grams(head))
+        # An edit changes at most two bigrams
+        need = max(1, len(grams) - 2 * max_edits)
+        shared = Counter(chain.from_iterable(self._grams.get(g, ()) for g in grams))
+        close = [t for t, n in shared.items() if n >= need]
+        return {t for t in close if bounded_levenshtein(head, self._tokens[t][:PREFIX_LEN], max_edits) is not None}
+
+    def fuzzy(
+        self,
+        q: str,
+        limit: int = 10,
+        max_edits: int = MAX_EDITS,
+        max_candidates: int = MAX_CANDIDATES,
+    ) -> List[Dict[str, object]]:
+        """Names within max_edits of q (whole-name edit distance), closest first.
+
+        Candidates contain a token similar to each query token. If those give
+        fewer than `limit` names, names matching every token but one are
+        checked too, so a mistyped word that happens to resemble another
+        supplier's word cannot hide the right name. At most max_candidates
+        names are verified, so the Python-level work does not grow with the
+        index.
+        """
+        norm = normalize(q)
+        if not norm:
+            return []
+        max_edits = min(max_edits, MAX_EDITS)
+
+        words = set(norm.split())
+        matched: List[Set[int]] = []
+        for w in words:
+            similar = self._similar(w, min(max_edits, _token_edits(w)))
+            ids = set().union(*(self._postings[t] for t in similar))
+            if ids:
+                matched.append(ids)
+        # A word with no similar vocabulary token is the one allowed miss
+        if len(matched) < max(1, len(words) - 1):
+            return []
+        matched.sort(key=len)
+        full = set.intersection(*matched)
+
+        scored: Dict[int, int] = {}
+        budget = max_candidates
+
+        def verify(ids: Iterable[int]) -> None:
+            nonlocal budget
+            for idx in sorted(ids)[:budget]:
+                dist = bounded_levenshtein(norm, self._norm[idx], max_edits)
+                if dist is not None:
+                    scored[idx] = dist
+            budget -= min(budget, len(ids))
+
+        verify(full)
+        if len(scored) < limit and len(matched) == len(words) > 1 and budget:
+            verify(set().union(*(
+                set.intersection(*(matched[:i] + matched[i + 1:])) for i in range(len(matched))
+            )) - full)
+        ranked = sorted(scored.items(), key=lambda kv: (kv[1], self._norm[kv[0]]))
+        return [self._hit(i, "fuzzy", d) for i, d in ranked[:limit]]
+
+    def search(self, q: str, limit: int = 10) -> List[Dict[str, object]]:
+        """Autocomplete: exact hits, then prefix hits; capped fuzzy only if both miss."""
+        out = self.exact(q)[:limit]
+        seen = {h["uri"] for h in out}
+        for h in self.prefix(q, limit):
+            if len(out) >= limit:
+                break
+            if h["uri"] not in seen:
+                seen.add(h["uri"])
+                out.append(h)
+        if out or len(normalize(q)) < SEARCH_FUZZY_MIN_LEN:
+            return out
+        return self.fuzzy(q, limit, max_edits=SEARCH_FUZZY_EDITS, max_candidates=SEARCH_FUZZY_CANDIDATES)
+
+    def resolve(self, name: str) -> Optional[Dict[str, object]]:
+        """Best single match for a free-text supplier name, or None.
+
+        Exact matches win. Otherwise the closest fuzzy match is used, but only
+        when it is unambiguous (no other candidate at the same distance).
+        """
+        hits = self.exact(name)
+        if hits:
+            return hits[0]
+        hits = self.fuzzy(name, limit=2)
+        if not hits:
+            return None
+        if len(hits) > 1 and hits[1]["distance"] == hits[0]["distance"]:
+            return None
+        return hits[0]
+
+
+def load_supplier_index(endpoint: str) -> SupplierIndex:
+    q = PREFIXES + """
+SELECT ?s ?lbl WHERE {
+  ?s a scr:Supplier ;
+     rdfs:label ?lbl .
+}
+"""
+    with stage("supplier_index_load"):
+        rows = sparql_select(endpoint, q, timeout_s=120)
+        return SupplierIndex((r["s"]["value"], r["lbl"]["value"]) for r in rows)
+
+
+_CACHE: VersionedCache[SupplierIndex] = VersionedCache(
+    load_supplier_index,
+    check_interval_s=float(os.environ.get("SUPPLIER_INDEX_REFRESH_S", "60")),
+)
+
+
+def get_supplier_index(endpoint: str) -> SupplierIndex:
+    return _CACHE.get(endpoint)
+
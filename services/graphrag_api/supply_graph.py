@@ -0,0 +1,255 @@
+import os
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from kg import PREFIXES, VersionedCache, sparql_select
+from metrics import stage
+
+
+class GroupedEdges:
+    """Edges (src -> dst) sorted by dst, ready for ufunc.reduceat.
+
+    `targets` are the distinct dst ids and `starts` the offsets of their edge
+    runs, so `ufunc.reduceat(values[..., src], starts, axis=-1)` aggregates
+    one value per target in a single vectorized pass.
+    """
+
+    def __init__(self, src: np.ndarray, dst: np.ndarray):
+        order = np.lexsort((src, dst))
+        self.src = src[order]
+        self.dst = dst[order]
+        if len(self.dst):
+            self.targets, self.starts = np.unique(self.dst, return_index=True)
+        else:
+            self.targets = np.zeros(0, dtype=np.int64)
+            self.starts = np.zeros(0, dtype=np.int64)
+
+    def __len__(self) -> int:
+        return len(self.src)
+
+    def sources_of(self, target: int) -> np.ndarray:
+        pos = np.searchsorted(self.targets, target)
+        if pos >= len(self.targets) or self.targets[pos] != target:
+            return np.zeros(0, dtype=np.int64)
+        end = self.starts[pos + 1] if pos + 1 < len(self.starts) else len(self.src)
+        return self.src[self.starts[pos]:end]
+
+    def reduce(self, ufunc: np.ufunc, values: np.ndarray) -> np.ndarray:
+        # values: (..., n_src) -> (..., len(targets))
+        if not len(self.src):
+            return np.zeros(values.shape[:-1] + (0,), dtype=values.dtype)
+        return ufunc.reduceat(values[..., self.src], self.starts, axis=-1)
+
+
+def _adjacency(src: np.ndarray, dst: np.ndarray, n: int) -> List[List[int]]:
+    """dst ids of each src id 0..n-1 as lists."""
+    order = np.argsort(src, kind="stable")
+    src, dst = src[order], dst[order].tolist()
+    bounds = np.searchsorted(src, np.arange(n + 1)).tolist()
+    return [dst[a:b] for a, b in zip(bounds[:-1], bounds[1:])]
+
+
+def _dependency_levels(child: np.ndarray, parent: np.ndarray, n: int) -> Tuple[List[GroupedEdges], GroupedEdges]:
+    """Dependency edges grouped by the topological level of their parent part.
+
+    Level 0 parts have no subcomponents; a part is on level k + 1 once all of
+    its children are on levels <= k. Edges whose parent never gets a level
+    (it is on, or above, a BOM cycle) are returned separately.
+    """
+    waiting = np.bincount(parent, minlength=n)
+    level = np.where(waiting == 0, 0, -1)
+    d = 0
+    while True:
+        out = level[child] == d
+        if not out.any():
+            break
+        waiting -= np.bincount(parent[out], minlength=n)
+        ready = np.unique(parent[out])
+        ready = ready[waiting[ready] == 0]
+        level[ready] = d + 1
+        d += 1
+    edge_level = level[parent]
+    levels = [GroupedEdges(child[edge_level == k], parent[edge_level == k]) for k in range(1, d + 1)]
+    cyclic = edge_level < 0
+    return [lv for lv in levels if len(lv)], GroupedEdges(child[cyclic], parent[cyclic])
+
+
+class SupplyGraph:
+    """Dense-id snapshot of supplier -> part -> (subcomponentOf)* -> product.
+
+    Node ids are positions in the uri lists. Edge arrays are grouped for
+    reduceat so whole scenario batches (rows) are evaluated at once.
+    """
+
+    def __init__(
+        self,
+        suppliers: List[Tuple[str, str]],
+        parts: List[Tuple[str, str, str]],
+        products: List[Tuple[str, str]],
+        supplies: List[Tuple[str, str]],
+        subcomponent_of: List[Tuple[str, str]],
+        used_in: List[Tuple[str, str]],
+    ):
+        self.supplier_uris: List[str] = []
+        self.supplier_labels: List[str] = []
+        self.part_uris: List[str] = []
+        self.part_labels: List[str] = []
+        self.part_criticality: List[str] = []
+        self.product_uris: List[str] = []
+        self.product_labels: List[str] = []
+        self.supplier_id: Dict[str, int] = {}
+        self.part_id: Dict[str, int] = {}
+        self.product_id: Dict[str, int] = {}
+
+        for u, lbl in suppliers:
+            self._supplier(u, lbl)
+        for u, lbl, crit in parts:
+            self._part(u, lbl, crit)
+        for u, lbl in products:
+            self._product(u, lbl)
+
+        def edges(pairs, src_fn, dst_fn) -> Tuple[np.ndarray, np.ndarray]:
+            pairs = sorted({(src_fn(a), dst_fn(b)) for a, b in pairs})
+            arr = np.array(pairs, dtype=np.int64).reshape(-1, 2)
+            return arr[:, 0], arr[:, 1]
+
+        # supplier -> part, grouped by part: "suppliers of each part"
+        s, p = edges(supplies, self._supplier, self._part)
+        self.supply = GroupedEdges(s, p)
+        # child part -> parent part, grouped by parent: "children of each part"
+        c, pa = edges(subcomponent_of, self._part, self._part)
+        self.deps = GroupedEdges(c, pa)
+        # part -> product, grouped by product: "BOM of each product"
+        bp, pr = edges(used_in, self._part, self._product)
+        self.bom = GroupedEdges(bp, pr)
+
+        self.n_suppliers = len(self.supplier_uris)
+        self.n_parts = len(self.part_uris)
+        self.n_products = len(self.product_uris)
+
+        # Forward adjacency for path walks (supplier -> part -> parent ... -> product).
+        # Plain lists: a Python BFS indexes them far faster than numpy slices.
+        self.supplier_parts = _adjacency(s, p, self.n_suppliers)
+        self.part_parents = _adjacency(c, pa, self.n_parts)
+        self.part_products = _adjacency(bp, pr, self.n_parts)
+
+        self.dep_levels, self.dep_cyclic = _dependency_levels(c, pa, self.n_parts)
+
+        self.supplier_count = np.bincount(self.supply.dst, minlength=self.n_parts)
+        self.critical = np.array([c == "HIGH" for c in self.part_criticality], dtype=bool)
+
+    def _supplier(self, uri: str, label: Optional[str] = None) -> int:
+        i = self.supplier_id.get(uri)
+        if i is None:
+            i = self.supplier_id[uri] = len(self.supplier_uris)
+            self.supplier_uris.append(uri)
+            self.supplier_labels.append(label or uri.split("/")[-1])
+        return i
+
+    def _part(self, uri: str, label: Optional[str] = None, criticality: str = "") -> int:
+        i = self.part_id.get(uri)
+        if i is None:
+            i = self.part_id[uri] = len(self.part_uris)
+            self.part_uris.append(uri)
+            self.part_labels.append(label or uri.split("/")[-1])
+            self.part_criticality.append(criticality or "")
+        return i
+
+    def _product(self, uri: str, label: Optional[str] = None) -> int:
+        i = self.product_id.get(uri)
+        if i is None:
+            i = self.product_id[uri] = len(self.product_uris)
+            self.product_uris.append(uri)
+            self.product_labels.append(label or uri.split("/")[-1])
+        return i
+
+    def unsupplied_parts(self, failed: np.ndarray) -> np.ndarray:
+        """(S, n_suppliers) failed mask -> (S, n_parts) parts with no live supplier.
+
+        Parts nobody supplies in the KG (in-house or unmodelled) are never lost here.
+        """
+        alive = self.supply.reduce(np.add, (~failed).astype(np.int32))
+        lost = np.zeros((failed.shape[0], self.n_parts), dtype=bool)
+        lost[:, self.supply.targets] = alive == 0
+        return lost
+
+    def propagate_up(self, values: np.ndarray, ufunc: np.ufunc = np.logical_or) -> np.ndarray:
+        """Push per-part values from subcomponents to parents.
+
+        Works with logical_or (lost) and maximum (downtime). Parents are
+        visited level by level (see _dependency_levels), so every dependency
+        edge is reduced once. Only edges into BOM cycles, or above them, are
+        iterated to a fixpoint, which terminates because both ufuncs are
+        monotone and bounded.
+        """
+        values = values.copy()
+        for level in self.dep_levels:
+            t = level.targets
+            values[:, t] = ufunc(values[:, t], level.reduce(ufunc, values))
+        cyclic = self.dep_cyclic
+        for _ in range(self.n_parts + 1):
+            if not len(cyclic):
+                break
+            from_children = cyclic.reduce(ufunc, values)
+            parents = values[:, cyclic.targets]
+            merged = ufunc(parents, from_children)
+            if np.array_equal(merged, parents):
+                break
+            values[:, cyclic.targets] = merged
+        return values
+
+    def products_of(self, part_values: np.ndarray, ufunc: np.ufunc = np.logical_or) -> np.ndarray:
+        """(S, n_parts) -> (S, n_products) aggregated over each product's BOM."""
+        out = np.zeros((part_values.shape[0], self.n_products), dtype=part_values.dtype)
+        out[:, self.bom.targets] = self.bom.reduce(ufunc, part_values)
+        return out
+
+    def bom_parts(self, product: int) -> np.ndarray:
+        return self.bom.sources_of(product)
+
+    def suppliers_of(self, part: int) -> np.ndarray:
+        return self.supply.sources_of(part)
+
+    def children_of(self, part: int) -> np.ndarray:
+        return self.deps.sources_of(part)
+
+
+def _pairs(endpoint: str, pattern: str) -> List[Tuple[str, str]]:
+    rows = sparql_select(endpoint, PREFIXES + f"\nSELECT DISTINCT ?a ?b WHERE {{ {pattern} }}\n", timeout_s=300)
+    return [(r["a"]["value"], r.get("b", {}).get("value")) for r in rows]
+
+
+def load_supply_graph(endpoint: str) -> SupplyGraph:
+    with stage("supply_graph_load"):
+        suppliers = _pairs(endpoint, "?a a scr:Supplier . OPTIONAL { ?a rdfs:label ?b }")
+        rows = sparql_select(endpoint, PREFIXES + """
+SELECT ?p ?lbl ?crit WHERE {
+  ?p a scr:Part .
+  OPTIONAL { ?p rdfs:label ?lbl }
+  OPTIONAL { ?p scr:criticality ?crit }
+}
+""", timeout_s=300)
+        parts = [
+            (r["p"]["value"], r.get("lbl", {}).get("value"), r.get("crit", {}).get("value", ""))
+            for r in rows
+        ]
+        products = _pairs(endpoint, "?a a scr:Product . OPTIONAL { ?a rdfs:label ?b }")
+        return SupplyGraph(
+            suppliers=suppliers,
+            parts=parts,
+            products=products,
+            supplies=_pairs(endpoint, "?a scr:supplies ?b"),
+            subcomponent_of=_pairs(endpoint, "?a scr:subcomponentOf ?b"),
+            used_in=_pairs(endpoint, "?a scr:usedIn ?b"),
+        )
+
+
+_CACHE: VersionedCache[SupplyGraph] = VersionedCache(
+    load_supply_graph,
+    check_interval_s=float(os.environ.get("SUPPLY_GRAPH_REFRESH_S", "60")),
+)
+
+
+def get_supply_graph(endpoint: str) -> SupplyGraph:
+    return _CACHE.get(endpoint)
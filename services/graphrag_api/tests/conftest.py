@@ -0,0 +1,26 @@
+import os
+import sys
+
+import pytest
+
+# The API modules are imported flat (see Dockerfile), not as a package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from supply_graph import SupplyGraph  # noqa: E402
+
+
+@pytest.fixture
+def small_graph() -> SupplyGraph:
+    # S1 -> P1 (HIGH, single source) -> A1 -> X
+    # S1, S2 -> P2 -> A2 -> Y
+    # S3 -> P3 (HIGH) -> A1, and P3 -> Z directly
+    # A1 and A2 are assembled in-house (no supplier)
+    return SupplyGraph(
+        suppliers=[("S1", "Astra"), ("S2", "Borealis"), ("S3", "Cobalt")],
+        parts=[("P1", "Bearing", "HIGH"), ("P2", "Bolt", "LOW"), ("P3", "Chip", "HIGH"),
+               ("A1", "Drive", "MEDIUM"), ("A2", "Frame", "LOW")],
+        products=[("X", "Xray"), ("Y", "Yacht"), ("Z", "Zoom")],
+        supplies=[("S1", "P1"), ("S1", "P2"), ("S2", "P2"), ("S3", "P3")],
+        subcomponent_of=[("P1", "A1"), ("P3", "A1"), ("P2", "A2")],
+        used_in=[("A1", "X"), ("A2", "Y"), ("P3", "Z")],
+    )
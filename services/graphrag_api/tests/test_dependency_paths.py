@@ -0,0 +1,61 @@
+import pytest
+
+from dependency_paths import explain_paths, k_shortest_paths
+from supply_graph import SupplyGraph
+
+
+@pytest.fixture
+def graph() -> SupplyGraph:
+    # S -> P1 -> X directly, S -> P2 -> B -> X, S -> P1 -> A -> B -> X,
+    # and B -> A closes a BOM cycle. Y is built from a part S does not reach.
+    return SupplyGraph(
+        suppliers=[("S", "Astra")],
+        parts=[(u, u, "") for u in ("P1", "P2", "A", "B", "Q")],
+        products=[("X", "Xray"), ("Y", "Yacht")],
+        supplies=[("S", "P1"), ("S", "P2")],
+        subcomponent_of=[("P1", "A"), ("A", "B"), ("P2", "B"), ("B", "A")],
+        used_in=[("P1", "X"), ("B", "X"), ("Q", "Y")],
+    )
+
+
+def labels(graph, res):
+    return {graph.product_uris[p]: [[graph.part_uris[i] for i in c] for c in chains] for p, chains in res["paths"].items()}
+
+
+def test_k_shortest_chains_in_hop_order(graph):
+    res = k_shortest_paths(graph, 0, k=3)
+    assert labels(graph, res) == {"X": [["P1"], ["P2", "B"], ["P1", "A", "B"]]}
+    assert res["search"]["cycles_skipped"] > 0
+    assert not res["search"]["depth_limited"] and not res["search"]["expansion_limited"]
+
+
+def test_k_caps_chains_per_product(graph):
+    assert labels(graph, k_shortest_paths(graph, 0, k=2)) == {"X": [["P1"], ["P2", "B"]]}
+
+
+def test_depth_limit_is_reported(graph):
+    res = k_shortest_paths(graph, 0, k=3, max_depth=2)
+    assert labels(graph, res) == {"X": [["P1"], ["P2", "B"]]}
+    assert res["search"]["depth_limited"]
+
+
+def test_expansion_limit_is_reported(graph):
+    res = k_shortest_paths(graph, 0, k=3, max_expanded=1)
+    assert labels(graph, res) == {"X": [["P1"]]}
+    assert res["search"]["expansion_limited"]
+    assert res["search"]["expanded"] == 1
+
+
+def test_unreached_products(graph):
+    res = k_shortest_paths(graph, 0, products=[graph.product_id["Y"]], k=3)
+    assert res["paths"] == {}
+    assert res["search"]["unreached"] == [graph.product_id["Y"]]
+
+
+def test_explain_paths_uses_uris_and_labels(graph):
+    res = explain_paths(graph, "S", ["X", "Y", "Nope"], k=1)
+    assert res["paths"] == {
+        "X": [[{"uri": "S", "label": "Astra"}, {"uri": "P1", "label": "P1"}, {"uri": "X", "label": "Xray"}]],
+    }
+    assert res["search"]["unreached"] == ["Y", "Nope"]
+    assert explain_paths(graph, "Unknown", ["X"])["paths"] == {}
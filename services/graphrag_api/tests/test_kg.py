@@ -0,0 +1,66 @@
+import threading
+import time
+
+import kg
+from kg import VersionedCache
+
+
+def wait_for(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline
+        time.sleep(0.01)
+
+
+def test_refresh_runs_in_the_background(monkeypatch):
+    version = {"v": "1"}
+    release = threading.Event()
+    builds = []
+    monkeypatch.setattr(kg, "kg_version", lambda endpoint: version["v"])
+
+    def build(endpoint):
+        builds.append(version["v"])
+        if len(builds) > 1:
+            release.wait(5)
+        return f"value{version['v']}"
+
+    cache = VersionedCache(build, check_interval_s=0.0)
+    # Nothing cached yet: the first build runs in the caller
+    assert cache.get("e") == "value1"
+
+    version["v"] = "2"
+    t0 = time.monotonic()
+    assert cache.get("e") == "value1"
+    assert cache.get("e") == "value1"
+    assert time.monotonic() - t0 < 1.0
+    release.set()
+    wait_for(lambda: cache.get("e") == "value2")
+    assert builds == ["1", "2"]
+
+
+def test_unchanged_version_is_not_rebuilt(monkeypatch):
+    monkeypatch.setattr(kg, "kg_version", lambda endpoint: "1")
+    builds = []
+    cache = VersionedCache(lambda e: builds.append(e) or len(builds), check_interval_s=0.0)
+    assert cache.get("e") == 1
+    for _ in range(3):
+        cache.get("e")
+        wait_for(lambda: not cache._refreshing)
+    assert builds == ["e"]
+
+
+def test_failed_refresh_keeps_the_current_value(monkeypatch):
+    calls = {"n": 0}
+
+    def probe(endpoint):
+        calls["n"] += 1
+        if calls["n"] > 1:
+            raise RuntimeError("fuseki down")
+        return "1"
+
+    monkeypatch.setattr(kg, "kg_version", probe)
+    cache = VersionedCache(lambda e: "value", check_interval_s=0.0)
+    assert cache.get("e") == "value"
+    assert cache.get("e") == "value"
+    wait_for(lambda: calls["n"] > 1 and not cache._refreshing)
+    assert cache.get("e") == "value"
@@ -0,0 +1,191 @@
+import pytest
+
+pytest.importorskip("transformers")
+
+import rag  # noqa: E402
+
+
+def uri(v):
+    return {"type": "uri", "value": v}
+
+
+def lit(v):
+    return {"type": "literal", "value": str(v)}
+
+
+PART = {"part": uri("P1"), "partLabel": lit("Bearing"), "crit": lit("HIGH"), "volume": lit(5),
+        "critRank": lit(0), "sortLabel": lit("Bearing"), "key": lit("P1")}
+PRODUCT = {"product": uri("X"), "productLabel": lit("Xray"), "basePart": uri("P1"), "basePartLabel": lit("Bearing"),
+           "crit": lit("HIGH"), "direct": lit(1), "critRank": lit(0), "sortLabel": lit("Xray"),
+           "key": lit("X"), "key2": lit("P1")}
+
+
+@pytest.fixture
+def offline_impact(monkeypatch):
+    monkeypatch.setattr(rag, "_resolve_supplier", lambda e, n: {"uri": "S1", "label": "Astra", "match": "exact"})
+    monkeypatch.setattr(
+        rag, "_top_impacts",
+        lambda *a: ([PART], [PRODUCT], [], {"parts": False, "products": False, "regions": False}),
+    )
+    monkeypatch.setattr(rag, "_llm_summarize", lambda *a: "summary")
+
+
+def impact():
+    return rag.impact_analysis("Astra", 10, 10, 10, "http://fuseki", "model", None)
+
+
+def test_enrichment_failures_keep_the_impact_result(offline_impact, monkeypatch):
+    def fail(message):
+        def raise_(*a, **k):
+            raise RuntimeError(message)
+        return raise_
+
+    monkeypatch.setattr(rag, "get_alternative_index", fail("artifact unreadable"))
+    monkeypatch.setattr(rag, "get_supply_graph", fail("query timed out"))
+    out = impact()
+    assert [p["uri"] for p in out["impacted_parts"]] == ["P1"]
+    assert out["impacted_parts"][0]["alternatives"] is None
+    assert [p["uri"] for p in out["impacted_products"]] == ["X"]
+    assert out["dependency_paths"] == {}
+    assert out["path_search"]["error"] == "supply graph unavailable: query timed out"
+    assert out["path_search"]["alternatives_error"] == "alternatives lookup failed: artifact unreadable"
+    assert out["llm_summary"] == "summary"
+
+
+# --- keyset cursors -------------------------------------------------------
+
+SCR = "https://example.org/supplychain/kg#"
+
+
+def test_after_filter_for_ties_on_leading_keys():
+    f = rag._after("parts", ["0", "12", "Bolt", "P1"])
+    assert f == (
+        '  FILTER(?critRank > 0 || (?critRank = 0 && (?volume < 12 || (?volume = 12 && '
+        '(?sortLabel > "Bolt" || (?sortLabel = "Bolt" && (?key > "P1")))))))\n'
+    )
+
+
+def test_after_filter_for_desc_numeric_keys():
+    # Regions sort by volume DESC: continue below the last volume, exact for big integers
+    f = rag._after("regions", ["9007199254740993", "North", "R1", "F1"])
+    assert f.startswith("  FILTER(?volume < 9007199254740993 || (?volume = 9007199254740993 && ")
+    assert rag._literal("12.5", True) == "12.5"
+    assert rag._literal("7", True) == "7"
+
+
+def test_literal_escaping():
+    assert rag._literal('say "hi"\\now\nnext\r', False) == '"say \\"hi\\"\\\\now\\nnext\\r"'
+
+
+def test_cursor_round_trip():
+    row = {"critRank": lit(0), "volume": lit(5), "sortLabel": lit('Ro"d'), "key": lit("P1")}
+    c = rag.decode_cursor(rag.encode_cursor("parts", "S1", row, "v1"))
+    assert c == {"r": "parts", "s": "S1", "k": ["0", "5", 'Ro"d', "P1"], "v": "v1"}
+
+
+@pytest.mark.parametrize("cursor", [
+    "not base64 !!",
+    rag.base64.urlsafe_b64encode(b"[1, 2]").decode(),
+    rag.base64.urlsafe_b64encode(b'{"k": "x"}').decode(),
+])
+def test_malformed_cursors(cursor):
+    with pytest.raises(ValueError):
+        rag.decode_cursor(cursor)
+
+
+@pytest.mark.parametrize("keys", [
+    ["0", "5", "Bolt"],                  # wrong length
+    ["0", "5", {"x": 1}, "P1"],          # not a string
+    ["0", "nan", "Bolt", "P1"],          # not finite
+    ["0", "5 || true", "Bolt", "P1"],    # not a number
+])
+def test_malformed_cursor_keys(keys):
+    with pytest.raises(ValueError):
+        rag._after("parts", keys)
+
+
+def _graph():
+    from rdflib import Graph, Literal, Namespace
+    from rdflib.namespace import RDFS
+
+    scr = Namespace(SCR)
+    g = Graph()
+    s = scr["Supplier/S1"]
+    parts = {
+        # key: (label, criticality, shipped qty)
+        "P1": ("Bolt", "HIGH", 5), "P2": ("Bolt", "HIGH", 5), "P3": ('Nut "M6"', "HIGH", 5),
+        "P4": ("Back\\slash", "LOW", 9), "P5": (None, "LOW", 0), "P6": ("Line\nbreak", None, 9),
+        "P7": ("Bolt", "HIGH", 7),
+    }
+    for i, (key, (label, crit, qty)) in enumerate(parts.items()):
+        p = scr[f"Part/{key}"]
+        g.add((s, scr.supplies, p))
+        if label is not None:
+            g.add((p, RDFS.label, Literal(label)))
+        if crit:
+            g.add((p, scr.criticality, Literal(crit)))
+        if qty:
+            sh = scr[f"Shipment/{i}"]
+            g.add((sh, scr.fromSupplier, s))
+            g.add((sh, scr.forPart, p))
+            g.add((sh, scr.toFacility, scr[f"Facility/F{i % 3}"]))
+            g.add((sh, scr.qty, Literal(qty)))
+        # Every part is used in two products, some reached twice through a parent
+        g.add((p, scr.usedIn, scr[f"Product/X{i % 2}"]))
+        g.add((p, scr.usedIn, scr[f"Product/Y{i % 3}"]))
+        g.add((p, scr.subcomponentOf, scr["Part/P1"]))
+    for i in range(4):
+        f = scr[f"Facility/F{i}"]
+        g.add((s, scr.deliversTo, f))
+        g.add((f, scr.locatedIn, scr[f"Region/R{i % 2}"]))
+        g.add((f, RDFS.label, Literal(f"Plant {i}")))
+    g.add((scr["Region/R0"], RDFS.label, Literal("North")))
+    return g
+
+
+@pytest.fixture
+def rdf_kg(monkeypatch):
+    g = _graph()
+
+    def select(endpoint, q, **kw):
+        res = g.query(q)
+        return [
+            {str(v): {"value": str(row[v])} for v in res.vars if row[v] is not None}
+            for row in res
+        ]
+
+    monkeypatch.setattr(rag, "_sparql_select", select)
+    monkeypatch.setattr(rag, "kg_version", lambda endpoint: "v1")
+    monkeypatch.setattr(rag, "_resolve_supplier", lambda e, n: {"uri": f"{SCR}Supplier/S1", "label": "Astra"})
+    return select
+
+
+@pytest.mark.parametrize("relation", rag.RELATIONS)
+@pytest.mark.parametrize("limit", [1, 2, 3])
+def test_paging_to_the_end_returns_the_full_ordered_list(rdf_kg, relation, limit):
+    full = [rag._item(relation, r) for r in rdf_kg(None, rag._relation_query(relation, f"{SCR}Supplier/S1"))]
+    assert len(full) > 3
+
+    got, cursor = [], None
+    while True:
+        page = rag.impact_page("Astra", relation, limit, cursor, "http://fuseki")
+        assert len(page["items"]) <= limit
+        got += page["items"]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert got == full
+
+
+def test_foreign_and_expired_cursors(rdf_kg, monkeypatch):
+    cursor = rag.impact_page("Astra", "parts", 2, None, "http://fuseki")["next_cursor"]
+    with pytest.raises(ValueError, match="does not belong"):
+        rag.impact_page("Astra", "regions", 2, cursor, "http://fuseki")
+    monkeypatch.setattr(rag, "_resolve_supplier", lambda e, n: {"uri": f"{SCR}Supplier/S2", "label": "Other"})
+    with pytest.raises(ValueError, match="does not belong"):
+        rag.impact_page("Other", "parts", 2, cursor, "http://fuseki")
+
+    monkeypatch.setattr(rag, "_resolve_supplier", lambda e, n: {"uri": f"{SCR}Supplier/S1", "label": "Astra"})
+    monkeypatch.setattr(rag, "kg_version", lambda endpoint: "v2")
+    with pytest.raises(ValueError, match="expired"):
+        rag.impact_page("Astra", "parts", 2, cursor, "http://fuseki")
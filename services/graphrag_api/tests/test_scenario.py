@@ -0,0 +1,85 @@
+import numpy as np
+import pytest
+
+import scenario
+from scenario import evaluate_scenario
+from supplier_index import SupplierIndex
+
+
+def failed(graph, *uris):
+    return [graph.supplier_id[u] for u in uris]
+
+
+def test_graph_ids_and_supplier_counts(small_graph):
+    g = small_graph
+    assert (g.n_suppliers, g.n_parts, g.n_products) == (3, 5, 3)
+    assert g.supplier_count.tolist() == [1, 2, 1, 0, 0]
+    assert g.critical.tolist() == [True, False, True, False, False]
+    assert sorted(g.part_uris[p] for p in g.children_of(g.part_id["A1"])) == ["P1", "P3"]
+    assert sorted(g.supplier_uris[s] for s in g.suppliers_of(g.part_id["P2"])) == ["S1", "S2"]
+
+
+def test_unsupplied_parts_never_include_in_house_parts(small_graph):
+    g = small_graph
+    mask = np.ones((1, g.n_suppliers), dtype=bool)
+    lost = g.unsupplied_parts(mask)[0]
+    assert [g.part_uris[p] for p in np.flatnonzero(lost)] == ["P1", "P2", "P3"]
+
+
+def test_single_supplier_failure(small_graph):
+    out = evaluate_scenario(small_graph, failed(small_graph, "S1"))
+    assert out["counts"] == {
+        "failed_suppliers": 1,
+        "parts_without_supplier": 1,
+        "parts_lost": 2,
+        "products_lost": 1,
+        "single_source_critical": 1,
+    }
+    # Critical parts first, then parts that lost their suppliers
+    assert [(p["uri"], p["cause"]) for p in out["lost_parts"]] == [
+        ("P1", "no_remaining_supplier"),
+        ("A1", "subcomponent_lost"),
+    ]
+    assert out["impacted_products"] == [{"uri": "X", "label": "Xray", "via_parts": ["Drive"]}]
+    assert out["single_source_critical"] == [{"uri": "P1", "label": "Bearing", "supplier": "Astra"}]
+    assert out["truncated"] is False
+
+
+def test_second_source_fails_too(small_graph):
+    out = evaluate_scenario(small_graph, failed(small_graph, "S1", "S2", "S1"))
+    assert out["counts"]["failed_suppliers"] == 2
+    assert {p["uri"] for p in out["lost_parts"]} == {"P1", "P2", "A1", "A2"}
+    assert [p["uri"] for p in out["impacted_products"]] == ["X", "Y"]
+    # P2 had two suppliers, so it is not single source
+    assert [p["uri"] for p in out["single_source_critical"]] == ["P1"]
+
+
+def test_product_lost_through_direct_and_nested_parts(small_graph):
+    out = evaluate_scenario(small_graph, failed(small_graph, "S3"))
+    assert {p["uri"]: p["via_parts"] for p in out["impacted_products"]} == {"X": ["Drive"], "Z": ["Chip"]}
+
+
+def test_truncated_counts_every_list(small_graph):
+    out = evaluate_scenario(small_graph, failed(small_graph, "S1", "S3"), limit=1)
+    assert out["counts"]["parts_lost"] == 3
+    assert len(out["lost_parts"]) == len(out["impacted_products"]) == len(out["single_source_critical"]) == 1
+    assert out["truncated"] is True
+    assert evaluate_scenario(small_graph, failed(small_graph, "S1", "S3"), limit=3)["truncated"] is False
+
+
+@pytest.fixture
+def offline(monkeypatch, small_graph):
+    index = SupplierIndex([("S1", "Astra"), ("S2", "Borealis"), ("S3", "Cobalt")])
+    monkeypatch.setattr(scenario, "get_supply_graph", lambda endpoint: small_graph)
+    monkeypatch.setattr(scenario, "get_supplier_index", lambda endpoint: index)
+
+
+def test_scenario_analysis_resolves_names_and_uris(offline):
+    out = scenario.scenario_analysis(["astra", "S3", "Nobody"], "http://fuseki")
+    assert [s["uri"] for s in out["failed_suppliers"]] == ["S1", "S3"]
+    assert out["unresolved"] == ["Nobody"]
+
+
+def test_scenario_analysis_rejects_all_unresolved(offline):
+    with pytest.raises(LookupError, match="Nobody, Somebody"):
+        scenario.scenario_analysis(["Nobody", "Somebody"], "http://fuseki")
@@ -0,0 +1,163 @@
+import numpy as np
+import pytest
+
+import shipment_store
+from shipment_store import ShipmentStore, _day
+
+
+def shipment(sid, ship_date, supplier="S1", part="P1", qty=10, lead=None, status="ON_TIME"):
+    return {
+        "shipment_id": sid, "ship_date": ship_date, "supplier_key": supplier, "part_key": part,
+        "facility_key": "F1", "qty": qty, "lead_time_days": lead, "status": status,
+    }
+
+
+def store_of(rows) -> ShipmentStore:
+    store = ShipmentStore(shipment_store._empty(), {})
+    store.append(rows)
+    store._compact()
+    return store
+
+
+@pytest.fixture
+def store() -> ShipmentStore:
+    return store_of([
+        shipment("A", "2025-01-01", qty=10, lead=4, status="ON_TIME"),
+        shipment("B", "2025-01-10", qty=20, lead=8, status="LATE"),
+        shipment("C", "2025-01-20", qty=30, lead=None, status="ON_TIME"),
+        shipment("D", "2025-01-05", supplier="S2", qty=5, lead=2, status="LATE"),
+    ])
+
+
+def test_window_stats(store):
+    out = store.performance("supplier", store.code("supplier", "S1"), window_days=31, as_of=_day("2025-01-31"))
+    assert out["window"] == {"start": "2025-01-01", "end": "2025-01-31", "days": 31}
+    assert out["shipments"] == 3
+    assert out["on_time_rate"] == round(2 / 3, 4)
+    assert out["volume"] == 60
+    # The shipment without a lead time only counts towards rate and volume
+    assert out["lead_time_days"] == {"p50": 6.0, "p90": 7.6, "p95": 7.8}
+
+
+def test_window_bounds_are_inclusive(store):
+    s1 = store.code("supplier", "S1")
+    out = store.performance("supplier", s1, window_days=10, as_of=_day("2025-01-10"))
+    assert out["shipments"] == 2
+    out = store.performance("supplier", s1, window_days=8, as_of=_day("2025-01-09"))
+    assert out["shipments"] == 0
+    assert out["on_time_rate"] is None and out["lead_time_days"] is None
+
+
+def test_as_of_defaults_to_newest_shipment(store):
+    out = store.performance("part", store.code("part", "P1"), window_days=1)
+    assert out["window"]["end"] == "2025-01-20"
+    assert out["shipments"] == 1
+
+
+def test_rolling_series(store):
+    out = store.performance(
+        "supplier", store.code("supplier", "S1"), window_days=10, as_of=_day("2025-01-20"), points=3, step_days=10,
+    )
+    assert out["series"] == [
+        {"end": "2024-12-31", "shipments": 0, "on_time_rate": None, "volume": 0},
+        {"end": "2025-01-10", "shipments": 2, "on_time_rate": 0.5, "volume": 30},
+        {"end": "2025-01-20", "shipments": 1, "on_time_rate": 1.0, "volume": 30},
+    ]
+
+
+def test_appended_rows_are_visible_before_and_after_compaction(store, monkeypatch):
+    s1 = store.code("supplier", "S1")
+    res = store.append([shipment("A", "2025-01-02"), shipment("E", "2025-01-15", status="LATE")])
+    assert res == {"added": 1, "duplicates": 1, "total": 5}
+    before = store.performance("supplier", s1, window_days=31, as_of=_day("2025-01-31"))
+    assert before["shipments"] == 4
+
+    monkeypatch.setattr(shipment_store, "DELTA_MAX", 1)
+    store.append([shipment("F", "2025-01-16", supplier="S9")])
+    assert len(store._delta["day"]) == 0
+    after = store.performance("supplier", s1, window_days=31, as_of=_day("2025-01-31"))
+    assert after == before
+    assert store.performance("supplier", store.code("supplier", "S9"))["shipments"] == 1
+
+
+def test_unknown_key_and_missing_artifact(tmp_path):
+    empty = ShipmentStore.from_artifact(str(tmp_path / "missing.npz"))
+    assert len(empty) == 0
+    assert empty.code("supplier", "S1") is None
+    assert empty.performance("supplier", 0)["shipments"] == 0
+
+
+def test_artifact_round_trip(tmp_path):
+    path = tmp_path / "shipments.npz"
+    np.savez(
+        path,
+        day=np.array([_day("2025-02-01"), _day("2025-02-03")]),
+        qty=np.array([1, 2]),
+        lead_time_days=np.array([3.0, np.nan]),
+        on_time=np.array([True, False]),
+        supplier=np.array([0, 0]),
+        part=np.array([0, 1]),
+        facility=np.array([0, 0]),
+        supplier_keys=np.array(["S1"]),
+        part_keys=np.array(["P1", "P2"]),
+        facility_keys=np.array(["F1"]),
+        shipment_id=np.array(["A", "B"]),
+        build_id=np.array("b1"),
+    )
+    store = ShipmentStore.from_artifact(str(path))
+    assert store.build_id == "b1" and "A" in store
+    out = store.performance("supplier", store.code("supplier", "S1"), window_days=3)
+    assert (out["shipments"], out["on_time_rate"], out["volume"]) == (2, 0.5, 3)
+
+
+class FixedCache:
+    def __init__(self, value):
+        self.value = value
+
+    def get(self, endpoint):
+        return self.value
+
+
+@pytest.fixture
+def offline(monkeypatch, tmp_path, store):
+    monkeypatch.setattr(shipment_store, "SHIPMENT_LOG", str(tmp_path / "shipments_posted.csv"))
+    monkeypatch.setattr(shipment_store, "ARTIFACT_DIR", str(tmp_path))
+    monkeypatch.setattr(shipment_store, "_CACHE", FixedCache(store))
+    return store
+
+
+def test_ingest_logs_new_rows(offline):
+    batch = [shipment("A", "2025-01-01"), shipment("G", "2025-01-21", lead=2.5), shipment("G", "2025-01-22")]
+    res = shipment_store.ingest_shipments(batch, "http://fuseki")
+    assert (res["added"], res["duplicates"]) == (1, 2)
+    with open(shipment_store.SHIPMENT_LOG) as f:
+        assert f.read().splitlines() == [
+            "shipment_id,ship_date,supplier_id,part_id,facility_id,qty,lead_time_days,status",
+            "G,2025-01-21,S1,P1,F1,10,2.5,ON_TIME",
+        ]
+    assert "G" in offline
+
+
+def test_reload_replays_logged_rows_missing_from_the_export(offline):
+    shipment_store.ingest_shipments([shipment("G", "2025-01-21"), shipment("H", "2025-01-22")], "http://fuseki")
+    # A torn last line (crash mid-write) is skipped, and the next append starts a new line
+    with open(shipment_store.SHIPMENT_LOG, "a") as f:
+        f.write("X,2025-01-23,S1")
+    shipment_store.ingest_shipments([shipment("I", "2025-01-24")], "http://fuseki")
+
+    # No artifact in tmp_path: a fresh process starts from the log alone
+    reloaded = shipment_store.load_shipment_store("http://fuseki")
+    assert len(reloaded) == 3 and "I" in reloaded and "X" not in reloaded
+    out = reloaded.performance("supplier", reloaded.code("supplier", "S1"), window_days=31, as_of=_day("2025-01-31"))
+    assert (out["shipments"], out["volume"]) == (3, 30)
+
+
+def test_rows_logged_during_a_reload_reach_the_new_store(offline):
+    # The replacement is built, then a row lands on the old store before the swap
+    replacement = shipment_store.load_shipment_store("http://fuseki")
+    shipment_store.ingest_shipments([shipment("G", "2025-01-21")], "http://fuseki")
+    assert "G" in offline and "G" not in replacement
+
+    shipment_store._CACHE.value = replacement
+    assert "G" in shipment_store.get_shipment_store("http://fuseki")
+    assert len(replacement) == 1
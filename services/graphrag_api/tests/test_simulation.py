@@ -0,0 +1,122 @@
+import numpy as np
+import pytest
+
+import simulation
+from simulation import PRIOR_DAYS, RiskModel, run_simulation, simulate_chunk
+
+
+PART_REGIONS = [("P1", "R1", "Iberia"), ("P2", "R1", "Iberia"), ("P3", "R2", None)]
+
+
+def model_for(graph, disruptions, window_days=365.0, lead_times=None):
+    return RiskModel(graph, disruptions, lead_times or {}, PART_REGIONS, window_days)
+
+
+class ScriptedRng:
+    """Stands in for np.random.default_rng: every draw is zero except the outage starts.
+
+    simulate_chunk draws hit, severity index, outage, duration index and start,
+    in that order; zeros make every supplier fail with its first historical
+    severity and duration, so only `starts` (fractions of the horizon) vary.
+    """
+
+    def __init__(self, starts):
+        self.draws = [None, None, None, None, np.asarray(starts, dtype=np.float64)]
+
+    def random(self, shape):
+        draw = self.draws.pop(0)
+        return np.zeros(shape) if draw is None else draw
+
+
+def test_rates_shrink_towards_fleet_rate(small_graph):
+    model = model_for(small_graph, [
+        ("S1", "2024-01-01", "2024-01-10", 0.5),
+        ("S1", "2024-03-01", "2024-03-02", None),
+        ("S3", "2024-05-01", None, 2.0),
+        ("unknown", "2024-05-01", "2024-05-02", 1.0),
+    ], window_days=730.0)
+    fleet = 3 / 3 / 730.0
+    assert model.rate_per_day == pytest.approx([
+        (2 + PRIOR_DAYS * fleet) / (730 + PRIOR_DAYS),
+        (0 + PRIOR_DAYS * fleet) / (730 + PRIOR_DAYS),
+        (1 + PRIOR_DAYS * fleet) / (730 + PRIOR_DAYS),
+    ])
+    # S1 is pulled down towards the fleet rate; no history still means a non-zero rate
+    assert 0 < model.rate_per_day[1] < fleet < model.rate_per_day[0] < 2 / 730.0
+
+    # S2 samples the fleet pools; severities are clamped to [0, 1] and None counts as 1
+    def pool(values, off, length, i):
+        return values[off[i]:off[i] + length[i]].tolist()
+
+    assert pool(model.sev_pool, model.sev_off, model.sev_len, 0) == [0.5, 1.0]
+    assert pool(model.sev_pool, model.sev_off, model.sev_len, 1) == [0.5, 1.0, 1.0]
+    assert pool(model.sev_pool, model.sev_off, model.sev_len, 2) == [1.0]
+    assert pool(model.dur_pool, model.dur_off, model.dur_len, 1) == [10.0, 2.0]
+    assert model.region_labels == ["Iberia", "R2"]
+
+
+def test_short_windows_are_widened_to_a_year(small_graph):
+    model = model_for(small_graph, [("S1", None, None, None)], window_days=30.0)
+    assert model.window_days == 365.0
+
+
+@pytest.fixture
+def scripted(small_graph, monkeypatch):
+    # S1 is down for 30 days, S2 for 50, S3 for 5 (no lead time)
+    model = model_for(small_graph, [
+        ("S1", "2024-01-01", "2024-01-30", 1.0),
+        ("S2", "2024-01-01", "2024-02-19", 1.0),
+        ("S3", "2024-01-01", "2024-01-05", 1.0),
+    ])
+    # run 0: S1 [10, 40], S2 [20, 70], S3 [0, 5]; run 1: S2 moves to [50, 100]
+    rng = ScriptedRng([[0.10, 0.20, 0.0], [0.10, 0.50, 0.0]])
+    monkeypatch.setattr(simulation.np.random, "default_rng", lambda seed: rng)
+    return model
+
+
+def test_part_is_down_for_the_overlap_of_its_suppliers(scripted):
+    out = simulate_chunk(scripted, 2, 100.0, np.random.SeedSequence(0))
+    assert out["supplier_outages"].tolist() == [2, 2, 2]
+    # X <- A1 <- max(P1 = 30, P3 = 5); Y <- A2 <- P2 = overlap of S1 and S2
+    # (20 days in run 0, none in run 1); Z <- P3
+    assert out["product_down_days"].tolist() == [60.0, 20.0, 10.0]
+    assert out["product_loss"].tolist() == [2, 1, 2]
+    # R1 holds P1 and P2 and takes the longest of them; R2 holds P3
+    assert out["region_down_days"].tolist() == [60.0, 10.0]
+    assert out["region_loss"].tolist() == [2, 2]
+
+
+def test_run_simulation_ranks_regions_and_products(scripted):
+    out = run_simulation(scripted, runs=2, horizon_days=100.0, seed=1)
+    assert out["regions"] == [
+        {"uri": "R1", "label": "Iberia", "p_supply_loss": 1.0, "expected_downtime_days": 30.0},
+        {"uri": "R2", "label": "R2", "p_supply_loss": 1.0, "expected_downtime_days": 5.0},
+    ]
+    assert [(r["uri"], r["p_supply_loss"], r["expected_downtime_days"]) for r in out["products"]] == [
+        ("X", 1.0, 30.0), ("Z", 1.0, 5.0), ("Y", 0.5, 10.0),
+    ]
+    assert [r["p_outage"] for r in out["suppliers_most_disrupted"]] == [1.0, 1.0, 1.0]
+
+
+def test_same_seed_same_result_with_and_without_pool(small_graph, monkeypatch):
+    model = model_for(small_graph, [
+        ("S1", "2024-01-01", "2024-01-20", 0.8),
+        ("S2", "2024-02-01", "2024-02-03", 0.4),
+        ("S3", "2024-03-01", "2024-03-30", None),
+    ], lead_times={"S1": 7.0})
+    # Five chunks of 10 runs, spread over two worker processes
+    monkeypatch.setattr(simulation, "_CELLS_PER_CHUNK", 10 * model.graph.n_parts)
+    monkeypatch.setenv("SIM_WORKERS", "2")
+    assert model.chunk_size() == 10
+
+    serial = run_simulation(model, runs=50, horizon_days=180.0, seed=42, workers=1)
+    assert simulation._POOL is None
+    try:
+        pooled = run_simulation(model, runs=50, horizon_days=180.0, seed=42, workers=2)
+        assert simulation._POOL is not None
+    finally:
+        if simulation._POOL is not None:
+            simulation._POOL.shutdown()
+            simulation._POOL = simulation._POOL_MODEL = None
+    assert pooled == serial
+    assert run_simulation(model, runs=50, horizon_days=180.0, seed=43, workers=1) != serial
@@ -0,0 +1,102 @@
+from supplier_index import SupplierIndex, bounded_levenshtein, normalize
+
+
+NAMES = [
+    ("u:1", "Astra Components GmbH"),
+    ("u:2", "Île-de-France Castings"),
+    ("u:3", "Borealis Metals"),
+    ("u:4", "Borealis Metal Works"),
+    ("u:5", "Cobalt Precision Ltd"),
+]
+
+
+def index() -> SupplierIndex:
+    return SupplierIndex(NAMES)
+
+
+def test_normalize():
+    assert normalize("Île-de-France  GmbH") == "ile de france gmbh"
+    assert normalize("  ---  ") == ""
+
+
+def test_bounded_levenshtein():
+    assert bounded_levenshtein("kitten", "sitting", 3) == 3
+    assert bounded_levenshtein("kitten", "sitting", 2) is None
+    assert bounded_levenshtein("abc", "abc", 0) == 0
+    assert bounded_levenshtein("a", "abcd", 2) is None
+
+
+def test_blank_labels_are_skipped():
+    assert len(SupplierIndex(NAMES + [("u:6", "--")])) == len(NAMES)
+
+
+def test_exact_ignores_case_accents_and_punctuation():
+    hits = index().exact("ILE DE FRANCE castings")
+    assert [h["uri"] for h in hits] == ["u:2"]
+    assert hits[0]["match"] == "exact"
+
+
+def test_prefix_matches_any_word():
+    assert [h["uri"] for h in index().prefix("comp")] == ["u:1"]
+    assert {h["uri"] for h in index().prefix("borealis")} == {"u:3", "u:4"}
+    assert index().prefix("borealis", limit=1)[0]["uri"] in {"u:3", "u:4"}
+
+
+def test_fuzzy_tolerates_typos():
+    hits = index().fuzzy("Astra Componnets GmbH")
+    assert hits[0]["uri"] == "u:1"
+    assert hits[0]["distance"] == 2
+
+
+def test_fuzzy_tolerates_merged_words():
+    hits = index().fuzzy("astracomponents gmbh")
+    assert [h["uri"] for h in hits] == ["u:1"]
+    assert hits[0]["distance"] == 1
+
+
+def test_fuzzy_respects_max_edits_and_candidates():
+    assert index().fuzzy("Astra Componnets GmbH", max_edits=1) == []
+    assert index().fuzzy("Borealis Metalz", max_candidates=0) == []
+    assert index().fuzzy("Zephyr Plastics") == []
+
+
+def test_search_prefers_exact_then_prefix():
+    hits = index().search("borealis metals")
+    assert hits[0] == {"uri": "u:3", "label": "Borealis Metals", "match": "exact", "distance": 0}
+    assert [h["match"] for h in index().search("cob")] == ["prefix"]
+
+
+def test_search_fuzzy_fallback_is_bounded():
+    # One edit is allowed from autocomplete, two are not
+    assert [h["uri"] for h in index().search("Cobalt Precison Ltd")] == ["u:5"]
+    assert index().search("Cobalt Precisn Ltdd") == []
+    # Too short for the fuzzy fallback
+    assert index().search("xyz") == []
+
+
+def test_resolve():
+    assert index().resolve("astra components gmbh")["uri"] == "u:1"
+    assert index().resolve("Cobalt Precison Ltd")["uri"] == "u:5"
+    # "Borealis Metal Works" is 6 edits away, so the match is unambiguous
+    assert index().resolve("Borealis Metal")["uri"] == "u:3"
+    assert index().resolve("Nobody At All") is None
+
+
+def test_resolve_refuses_ties():
+    idx = SupplierIndex([("u:a", "Acme Steel"), ("u:b", "Acme Steet")])
+    assert idx.resolve("Acme Stee") is None
+
+
+def test_unrelated_supplier_does_not_hide_a_match():
+    # "mtls" is one edit from "mils" but two from "metals"
+    assert SupplierIndex([("u:1", "Pacific Metals")]).resolve("Pacific Mtls")["uri"] == "u:1"
+    idx = SupplierIndex([("u:1", "Pacific Metals"), ("u:2", "Mils Ltd")])
+    assert idx.resolve("Pacific Mtls")["uri"] == "u:1"
+    assert [h["uri"] for h in idx.fuzzy("Pacific Mtls")] == ["u:1"]
+
+
+def test_names_with_every_word_are_verified_first():
+    idx = SupplierIndex([("u:1", "Pacific Metals"), ("u:2", "Pacific Mils")])
+    hits = idx.fuzzy("Pacific Mtls")
+    assert [(h["uri"], h["distance"]) for h in hits] == [("u:2", 1), ("u:1", 2)]
+    assert [h["uri"] for h in idx.fuzzy("Pacific Mtls", limit=1)] == ["u:2"]
@@ -0,0 +1,63 @@
+import numpy as np
+
+from supply_graph import SupplyGraph
+
+
+def chain_graph(subcomponent_of, n_parts):
+    parts = [(f"P{i}", f"P{i}", "") for i in range(n_parts)]
+    return SupplyGraph([], parts, [], [], [(f"P{a}", f"P{b}") for a, b in subcomponent_of], [])
+
+
+def naive_propagate(graph, values, ufunc):
+    # Reference: sweep every dependency edge until nothing changes
+    values = values.copy()
+    while True:
+        before = values.copy()
+        for c, p in zip(graph.deps.src, graph.deps.dst):
+            values[:, p] = ufunc(values[:, p], values[:, c])
+        if np.array_equal(before, values):
+            return values
+
+
+def test_levels_follow_dependency_order():
+    # 0 -> 1 -> 3, 2 -> 3: parents are reduced after all their children
+    g = chain_graph([(0, 1), (1, 3), (2, 3)], 4)
+    assert [lvl.targets.tolist() for lvl in g.dep_levels] == [[1], [3]]
+    assert len(g.dep_cyclic) == 0
+
+
+def test_propagate_lost_and_downtime_through_a_chain():
+    g = chain_graph([(0, 1), (1, 2), (2, 3)], 4)
+    lost = np.array([[True, False, False, False], [False, False, True, False]])
+    assert g.propagate_up(lost).tolist() == [[True] * 4, [False, False, True, True]]
+
+    days = np.array([[5.0, 0.0, 7.0, 1.0]])
+    assert g.propagate_up(days, np.maximum).tolist() == [[5.0, 5.0, 7.0, 7.0]]
+
+
+def test_propagate_through_a_cycle():
+    # 1 <-> 2 form a BOM cycle fed by 0 and feeding 3
+    g = chain_graph([(0, 1), (1, 2), (2, 1), (2, 3)], 5)
+    assert len(g.dep_cyclic) > 0
+    days = np.array([[4.0, 0.0, 9.0, 0.0, 3.0]])
+    assert g.propagate_up(days, np.maximum).tolist() == [[4.0, 9.0, 9.0, 9.0, 3.0]]
+
+
+def test_propagate_matches_fixpoint_on_random_graphs():
+    rng = np.random.default_rng(7)
+    for n, m in [(30, 40), (200, 400), (50, 150)]:
+        edges = {(int(a), int(b)) for a, b in rng.integers(0, n, size=(m, 2)) if a != b}
+        g = chain_graph(sorted(edges), n)
+        days = rng.integers(0, 30, size=(3, n)).astype(float)
+        lost = rng.random((3, n)) < 0.05
+        assert np.array_equal(g.propagate_up(days, np.maximum), naive_propagate(g, days, np.maximum))
+        assert np.array_equal(g.propagate_up(lost), naive_propagate(g, lost, np.logical_or))
+
+
+def test_products_of_aggregates_bom(small_graph):
+    g = small_graph
+    days = np.zeros((1, g.n_parts))
+    days[0, g.part_id["P3"]] = 12.0
+    days[0, g.part_id["A2"]] = 4.0
+    out = g.products_of(g.propagate_up(days, np.maximum), np.maximum)[0]
+    assert dict(zip(g.product_uris, out.tolist())) == {"X": 12.0, "Y": 4.0, "Z": 12.0}